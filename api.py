@@ -0,0 +1,226 @@
+"""Headless JSON API for current waits, baselines and assessments.
+
+Serves what the Wait Times page shows without a Streamlit session:
+
+    GET /parks                       parks with their ids
+    GET /waits?park=<id>             every ride in a park
+    GET /waits?attractions=1,2,3     the given attractions
+
+Wait responses list the attractions in the page's order, best first, with
+their current wait and status, baseline and assessment. Each response carries
+an ETag derived from the latest snapshot timestamp of the parks it covers and
+a Cache-Control max-age that runs out when the collector's next batch is due.
+Clients that send If-None-Match get a 304 until new waits land. Responses are
+also cached in the process, with concurrent misses single-flighted, so any
+number of polling clients cost about one computation per collector interval.
+
+    python api.py --port 8000
+
+Settings come from the same environment variables as the app.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+from datetime import date, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load environment variables (before the modules below read their settings)
+load_dotenv()
+
+import assessment
+import baselines
+import reference
+import waits
+from cache import TTLCache
+
+response_cache = TTLCache(
+    ttl=waits.COLLECTOR_INTERVAL,
+    maxsize=int(os.getenv('api_cache_size', '1024')),
+)
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # NumPy scalars
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode(payload):
+    return json.dumps(payload, default=_json_default).encode()
+
+
+def _etag(data):
+    return '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return float(value)
+
+
+def _selection(query):
+    """The park ids and attraction ids a /waits query covers."""
+    if 'park' in query:
+        try:
+            park_id = int(query['park'][0])
+        except ValueError:
+            raise BadRequest(HTTPStatus.BAD_REQUEST, "park must be a park id")
+        park_names = {park['id']: park['name'] for park in reference.get_parks()}
+        if park_id not in park_names:
+            raise BadRequest(HTTPStatus.NOT_FOUND, f"Unknown park {park_id}")
+        ride_ids = [row['id'] for row in reference.get_park_attractions(park_names[park_id])]
+        return [park_id], ride_ids
+    if 'attractions' in query:
+        try:
+            attraction_ids = sorted({int(aid) for aid in query['attractions'][0].split(',') if aid.strip()})
+        except ValueError:
+            raise BadRequest(HTTPStatus.BAD_REQUEST, "attractions must be comma-separated attraction ids")
+        attraction_park_ids = reference.get_attraction_park_ids()
+        park_ids = sorted({attraction_park_ids[aid] for aid in attraction_ids if aid in attraction_park_ids})
+        if not park_ids:
+            raise BadRequest(HTTPStatus.NOT_FOUND, "No known attractions given")
+        return park_ids, attraction_ids
+    raise BadRequest(HTTPStatus.BAD_REQUEST, "Pass park=<id> or attractions=<id,id,...>")
+
+
+def _snapshot_version(park_ids):
+    """Timestamp of the newest wait across the parks' snapshots."""
+    latest = [
+        max(row['Last Updated'] for row in snapshot)
+        for snapshot in map(waits.get_park_snapshot, park_ids)
+        if snapshot
+    ]
+    return max(latest).isoformat() if latest else ''
+
+
+def _waits_payload(attraction_ids, version):
+    current_wait_times = waits.get_latest_waits(attraction_ids)
+    attractions = []
+    if current_wait_times:
+        baseline_rows = baselines.fetch(current_wait_times, baselines.window_start())
+        sample_counts = {b['attraction_id']: b['sample_count'] for b in baseline_rows}
+        assessed = assessment.assess_waits(pd.DataFrame(current_wait_times), baseline_rows)
+        for row in assessed.to_dict('records'):
+            pct = row["% of Average"]
+            attractions.append({
+                'attraction_id': row['attraction_id'],
+                'name': row['Attraction'],
+                'status': row['Status'],
+                'operating': not row["Non-Operating"],
+                'wait_minutes': _number(row['Wait Time (minutes)']),
+                'last_updated': row['Last Updated'],
+                'baseline_minutes': _number(row["Avg Wait (Same Time)"]),
+                'baseline_samples': int(sample_counts.get(row['attraction_id'], 0)),
+                'pct_of_baseline': None if pct >= assessment.NO_PERCENTAGE else _number(pct),
+                'assessment': row["Time-Based Assessment"],
+                'badge': row["Badge"],
+                'badge_color': row["Badge Color"],
+            })
+    return _encode({
+        'snapshot': version or None,
+        'baseline': {'statistic': baselines.STATISTIC, 'window_days': baselines.WINDOW_DAYS},
+        'attractions': attractions,
+    })
+
+
+def waits_response(query):
+    """(etag, body) of a /waits request, computed at most once per snapshot."""
+    park_ids, attraction_ids = _selection(query)
+    version = _snapshot_version(park_ids)
+    key = ('waits', tuple(attraction_ids), version)
+    etag = _etag(repr((key, baselines.STATISTIC, baselines.WINDOW_DAYS)).encode())
+    body = response_cache.get_or_load(
+        key,
+        lambda: _waits_payload(attraction_ids, version),
+        ttl=waits.seconds_until_next_collection(),
+    )
+    return etag, body
+
+
+def parks_response(query):
+    parks = reference.get_parks()
+    body = _encode([{'id': park['id'], 'name': park['name']} for park in parks])
+    etag = _etag(body)
+    return etag, body
+
+
+ROUTES = {
+    '/parks': parks_response,
+    '/waits': waits_response,
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'WilckAPI/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path.rstrip('/') or '/')
+        if route is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"No such endpoint {url.path}")
+        try:
+            etag, body = route(parse_qs(url.query))
+        except BadRequest as e:
+            return self._send_error(e.status, str(e))
+        except Exception as e:
+            self.log_error("Error handling %s: %r", self.path, e)
+            return self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal error")
+
+        max_age = int(waits.seconds_until_next_collection())
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', f'max-age={max_age}')
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'max-age={max_age}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        body = _encode({'error': message})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,27 @@
 import streamlit as st
 import os
+import html
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 import urllib.parse
-from streamlit_extras.stylable_container import stylable_container
 
-# Load environment variables
+# Load environment variables (before the modules below read their settings)
 load_dotenv()
 
-# Database connection function
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(os.getenv('db_url'))
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to database: {str(e)}")
-        return None
+# pandas, NumPy and streamlit_extras (and assessment and planner, which use
+# them) are imported by the pages that need them, so the selection pages
+# start without loading them
+import baselines
+import instrumentation
+import reference
+import waits
+
+# Seconds between card list refreshes when live updates are on
+LIVE_REFRESH_SECONDS = int(os.getenv('live_refresh_seconds', '60'))
+
+# "compact" renders the Wait Times cards as one HTML block, "widgets" as a
+# container of Streamlit elements per card
+CARD_LAYOUT = os.getenv('card_layout', 'compact')
 
 # Initialize session state
 if 'selected_park' not in st.session_state:
@@ -81,33 +83,397 @@ def update_query_params():
 # Update URL parameters to match current state
 update_query_params()
 
-#st.title("Wilck - Disneyland Planner")
+# Optional per-phase timing of this rerun (?diagnostics=1 or the diagnostics env var)
+profiler = instrumentation.Profiler(st.session_state.page, instrumentation.is_enabled(st.query_params))
 
-# Display page based on session state
-if st.session_state.page == "Park Selection":
-    st.header("Select a Park")
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM parks.park ORDER BY name")
-                parks = cur.fetchall()
-                park_names = [park['name'] for park in parks]
+# Baselines for the latest wait rows, cached in the session by the row's
+# timestamp so reruns only query attractions with a newer wait
+def get_session_baselines(current_wait_times, window_start):
+    seen = st.session_state.setdefault('seen_baselines', {})
+    changed = [
+        row for row in current_wait_times
+        if row['attraction_id'] not in seen or seen[row['attraction_id']][0] != row['Last Updated']
+    ]
+    if changed:
+        fetched = baselines.fetch(changed, window_start)
+        fetched = {b['attraction_id']: b for b in fetched}
+        for row in changed:
+            seen[row['attraction_id']] = (row['Last Updated'], fetched.get(row['attraction_id']))
+    return [
+        seen[row['attraction_id']][1]
+        for row in current_wait_times
+        if seen[row['attraction_id']][1] is not None
+    ]
+
+# Suggested order for the selected rides from their hourly wait history. The
+# history is cached, so this re-plans on every rerun with the latest statuses
+def show_plan(current_df):
+    import pandas as pd
+    import planner
+    
+    # Waits are bucketed in UTC; the plan is made and shown in park time
+    park_ids = reference.get_attraction_park_ids()
+    timezones = reference.get_park_timezones()
+    tz = timezones.get(park_ids.get(int(current_df['attraction_id'].iloc[0])), 'UTC')
+    
+    with st.expander("Plan My Visit", expanded=st.session_state.get('plan_requested', False)):
+        now = planner.local_now(tz)
+        st.session_state.setdefault('plan_start', now.time().replace(second=0, microsecond=0))
+        st.session_state.setdefault('plan_close', time(22, 0))
+        st.session_state.setdefault('plan_ride_minutes', planner.RIDE_MINUTES)
+        
+        start_col, close_col, ride_col = st.columns(3)
+        with start_col:
+            st.time_input("Start", key="plan_start")
+        with close_col:
+            st.time_input("Park closes", key="plan_close")
+        with ride_col:
+            st.number_input("Minutes per ride", min_value=0, max_value=60, key="plan_ride_minutes",
+                            help="Time on the ride plus walking to the next one")
+        
+        if st.button("Plan Ride Order"):
+            st.session_state.plan_requested = True
+        if not st.session_state.get('plan_requested'):
+            return
+        
+        start = datetime.combine(now.date(), st.session_state.plan_start)
+        close = datetime.combine(now.date(), st.session_state.plan_close)
+        if close <= start:
+            # Closing after midnight
+            close += timedelta(days=1)
+        
+        attraction_ids, hourly = planner.get_hourly_profiles(
+            current_df['attraction_id'],
+            (start.weekday() + 1) % 7,  # Postgres numbering, Sunday = 0
+            baselines.window_start(now),
+            tz
+        )
+        # Rides that aren't running are left out; current waits only count
+        # when the plan starts now
+        skip = set(current_df.loc[current_df["Non-Operating"], 'attraction_id'])
+        current_waits = None
+        if abs((start - now).total_seconds()) < planner.SLOT_MINUTES * 60:
+            current_waits = dict(zip(current_df['attraction_id'], current_df['Wait Time (minutes)']))
+        result = planner.plan(
+            attraction_ids, hourly, start, close,
+            current_waits=current_waits,
+            skip=skip,
+            ride_minutes=st.session_state.plan_ride_minutes
+        )
+        
+        names = dict(zip(current_df['attraction_id'], current_df['Attraction']))
+        if result['stops']:
+            st.dataframe(
+                pd.DataFrame({
+                    "Attraction": [names[stop['attraction_id']] for stop in result['stops']],
+                    "Get in Line": [stop['arrive'].strftime('%I:%M %p') for stop in result['stops']],
+                    "Expected Wait": [f"{stop['expected_wait']:.0f} min" for stop in result['stops']],
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+            st.caption(f"About {result['total_wait']:.0f} minutes of waiting in total, based on the "
+                       f"past {baselines.WINDOW_DAYS} days of waits for the same day of week. "
+                       f"Times are park time ({tz}).")
+        if result['unplanned']:
+            st.caption("Not planned: " + ", ".join(names[aid] for aid in result['unplanned']))
+
+# Styles of the compact card list, matching the widget cards
+CARD_CSS = """<style>
+.wilck-card { border: 1px solid #e0e0e0; border-radius: 10px; padding: 1rem; margin-bottom: 1rem; background-color: white; }
+.wilck-card.down { border-color: #ffcccc; background-color: #fff5f5; }
+.wilck-card-header { display: flex; align-items: center; gap: 1rem; margin-bottom: 0.5rem; }
+.wilck-card-name { flex: 3; font-size: 1.25rem; font-weight: 600; }
+.wilck-badge { flex: 1; padding: 4px 8px; border-radius: 4px; font-weight: bold; text-align: center; font-size: 0.9em; }
+.wilck-card details { border: 1px solid #e0e0e0; border-radius: 0.5rem; padding: 0.5rem 1rem; }
+.wilck-card summary { cursor: pointer; }
+.wilck-card-details { display: flex; gap: 1rem; margin-top: 0.5rem; }
+.wilck-card-details > div { flex: 1; }
+.wilck-card p { margin: 0 0 0.25rem 0; }
+</style>"""
+
+
+def _text(value):
+    # Escaped for HTML, and so Streamlit's Markdown doesn't read $ as math
+    return html.escape(str(value)).replace('$', '&#36;')
+
+
+def _missing(value):
+    # None or NaN, the only value not equal to itself
+    return value is None or value != value
+
+
+def format_wait(wait_time):
+    if _missing(wait_time):
+        return "N/A"
+    if wait_time == -1:
+        return "Walk on"
+    return f"{int(wait_time)} min"
+
+
+def card_html(row, no_percentage):
+    """One Wait Times card as HTML, with the same content as the widget cards."""
+    color = _text(row["Badge Color"])
+    parts = [
+        f"<div class='wilck-card{' down' if row['Status_Order'] == 2 else ''}'>",
+        "<div class='wilck-card-header'>",
+        f"<div class='wilck-card-name'>{_text(row['Attraction'])}</div>",
+        f"<div class='wilck-badge' style='background-color: {color}20; color: {color};'>{_text(row['Badge'])}</div>",
+        "</div>",
+    ]
+    # Only show wait time if the attraction is operating
+    if not row["Non-Operating"]:
+        parts.append(f"<p><strong>Current Wait:</strong> {format_wait(row['Wait Time (minutes)'])}</p>")
+    avg_wait = row['Avg Wait (Same Time)']
+    parts += [
+        "<details><summary>More Details</summary><div class='wilck-card-details'><div>",
+        f"<p><strong>{baselines.LABEL} Wait:</strong> {'N/A' if _missing(avg_wait) else f'{int(avg_wait)} min'}</p>",
+    ]
+    percentage = row["% of Average"]
+    if not _missing(percentage) and percentage < no_percentage:
+        parts.append(f"<p><strong>% of {baselines.LABEL}:</strong> {percentage:.1f}%</p>")
+    parts += [
+        "</div><div>",
+        f"<p><em>Updated: {row['Last Updated'].strftime('%I:%M %p')}</em></p>",
+        "</div></div></details></div>",
+    ]
+    return ''.join(parts)
+
+
+def cards_html(current_df):
+    """The whole card list as one HTML string, sent to the browser as a single element.
+
+    Kept on one line: a blank line or an indented one would end the HTML
+    block and have Markdown render the rest as text.
+    """
+    import assessment
+    
+    return CARD_CSS.replace('\n', '') + ''.join(
+        card_html(row, assessment.NO_PERCENTAGE) for row in current_df.to_dict('records')
+    )
+
+# One stylable container per card, with a Streamlit expander for the details
+def show_widget_cards(current_df):
+    import pandas as pd
+    from streamlit_extras.stylable_container import stylable_container
+    import assessment
+    
+    # Create single column for the cards
+    cols = st.columns(1)
+
+    # Iterate through the attractions and create cards
+    for idx, row in current_df.iterrows():
+        # Define card style based on status
+        card_style = """
+        {
+            border: 1px solid #e0e0e0;
+            border-radius: 10px;
+            padding: 1rem;
+            margin-bottom: 1rem;
+            background-color: white;
+        }
+        """
+    
+        if row["Status_Order"] == 2:
+            card_style = """
+            {
+                border: 1px solid #ffcccc;
+                border-radius: 10px;
+                padding: 1rem;
+                margin-bottom: 1rem;
+                background-color: #fff5f5;
+            }
+            """
+    
+        # Create the card in the single column
+        with cols[0]:
+            with stylable_container(
+                key=f"card_{idx}",
+                css_styles=card_style
+            ):
+                # Create two columns for the header area - attraction name and assessment
+                header_col1, header_col2 = st.columns([3, 1])
+            
+                with header_col1:
+                    # Attraction Name as header
+                    st.markdown(f"#### {row['Attraction']}")
+            
+                with header_col2:
+                    # Non-operating rides show their status, walk-ons a "no line" note
+                    assessment_text = row["Badge"]
+                    assessment_color = row["Badge Color"]
                 
-                selected_park = st.selectbox("Choose a park", park_names)
-                if selected_park:
-                    st.session_state.selected_park = selected_park
-                    # Update URL immediately when park is selected
-                    update_query_params()
+                    assessment_style = f"""
+                        padding: 4px 8px;
+                        border-radius: 4px;
+                        background-color: {assessment_color}20;
+                        color: {assessment_color};
+                        font-weight: bold;
+                        text-align: center;
+                        display: inline-block;
+                        width: 100%;
+                        font-size: 0.9em;
+                    """
+                
+                    st.markdown(
+                        f"<div style='{assessment_style}'>{assessment_text}</div>",
+                        unsafe_allow_html=True
+                    )
+
+                # Always visible wait time row
+                # Only show wait time if the attraction is operating
+                if not row["Non-Operating"]:
+                    wait_col1, wait_col2 = st.columns([1, 2])
+                    with wait_col1:
+                        # Current Wait Time
+                        wait_time = row['Wait Time (minutes)']
+                        if pd.isna(wait_time):
+                            wait_time = "N/A"
+                        elif wait_time == -1:
+                            wait_time = "Walk on"
+                        else:
+                            wait_time = f"{int(wait_time)} min"
+                        st.markdown(f"**Current Wait:** {wait_time}")
+
+                # Expandable section
+                with st.expander("More Details"):
+                    col1, col2 = st.columns(2)
+                
+                    with col1:
+                        # Baseline wait time
+                        avg_wait = row['Avg Wait (Same Time)']
+                        if pd.isna(avg_wait):
+                            avg_wait = "N/A"
+                        else:
+                            avg_wait = f"{int(avg_wait)} min"
+                        st.markdown(f"**{baselines.LABEL} Wait:** {avg_wait}")
                     
-                if st.button("Continue to Attraction Selection"):
-                    st.session_state.page = "Attraction Selection"
+                        # Percentage of the baseline
+                        if "% of Average" in row and not pd.isna(row["% of Average"]):
+                            percentage = row["% of Average"]
+                            if percentage < assessment.NO_PERCENTAGE:  # Check if it's not our NaN replacement value
+                                st.markdown(f"**% of {baselines.LABEL}:** {percentage:.1f}%")
+                
+                    with col2:
+                        # Last Updated
+                        st.markdown(f"*Updated: {row['Last Updated'].strftime('%I:%M %p')}*")
+
+# Card list for the Wait Times page. In live mode this runs as a fragment, so
+# only this part of the page reruns on every refresh
+def show_wait_times(profiler):
+    import pandas as pd
+    import assessment
+    
+    if profiler.finished:
+        # A live refresh of just this fragment gets its own breakdown
+        profiler.restart()
+    try:
+        # Latest waits come from the per-park snapshots shared by every session
+        with profiler.phase("latest_waits"):
+            current_wait_times = waits.get_latest_waits(st.session_state.selected_attractions)
+        
+        if current_wait_times:
+            # Compare against the same time of day over the baseline window
+            window_start = baselines.window_start()
+            
+            # Get the same-time historical baseline for every attraction, only
+            # querying those whose wait changed since this session last looked
+            with profiler.phase("baselines"):
+                baseline_rows = get_session_baselines(current_wait_times, window_start)
+            
+            # Assess every attraction against its baseline and sort them,
+            # operating attractions first and then by % of Average
+            with profiler.phase("assessment"):
+                current_df = assessment.assess_waits(pd.DataFrame(current_wait_times), baseline_rows)
+            
+            # Convert day of week number to day name for better display
+            day_mapping = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 
+                        4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
+            
+            # Keep the planner's place above the cards, but fill it once the
+            # cards are shown
+            plan_area = st.container()
+            
+            with profiler.phase("render"):
+                # Instead of displaying as a dataframe, create cards for each attraction
+                st.write("### Best wait times right now?")
+            
+                if CARD_LAYOUT == 'widgets':
+                    show_widget_cards(current_df)
+                else:
+                    st.markdown(cards_html(current_df), unsafe_allow_html=True)
+            
+                # Display a simplified legend explaining the assessment categories in an expander
+                with st.expander("Wait Time Assessment Legend"):
+                    st.markdown(f"""
+                    - **Very Good**: Current wait is at least 30% below the {baselines.DESCRIPTION}
+                    - **Good**: Current wait is 10-30% below the {baselines.DESCRIPTION}
+                    - **Average**: Current wait is within 10% of the {baselines.DESCRIPTION}
+                    - **Busy**: Current wait is 10-30% above the {baselines.DESCRIPTION}
+                    - **Very Busy**: Current wait is more than 30% above the {baselines.DESCRIPTION}
+                
+                    **Time-Based Assessment**: Compares to the {baselines.DESCRIPTION} for the same day of week and similar time of day (±1 hour) over the past {baselines.WINDOW_DAYS} days
+                    """)
+            
+                # Add a button to start over
+                if st.button("Start Over"):
+                    st.session_state.page = "Park Selection"
+                    st.session_state.selected_park = None
+                    st.session_state.selected_attractions = []
                     update_query_params()
                     st.rerun()
-        except Exception as e:
-            st.error(f"Error fetching parks: {str(e)}")
-        finally:
-            conn.close()
+            
+            # Suggested ride order, collapsed until asked for. A planner
+            # failure only replaces the plan, not the wait times
+            with plan_area:
+                try:
+                    with profiler.phase("plan"):
+                        show_plan(current_df)
+                except Exception as e:
+                    st.error(f"Error planning ride order: {str(e)}")
+        else:
+            st.info("No wait times available for selected attractions")
+            
+            # Add a button to go back and select different attractions
+            if st.button("Select Different Attractions"):
+                st.session_state.page = "Attraction Selection"
+                update_query_params()
+                st.rerun()
+    except Exception as e:
+        st.error(f"Error fetching wait times: {str(e)}")
+    
+    profiler.finish()
+    instrumentation.show_panel(profiler)
+
+#st.title("Wilck - Disneyland Planner")
+
+# Display page based on session state
+if st.session_state.page == "Park Selection":
+    st.header("Select a Park")
+    try:
+        # Parks come from the shared reference cache, so this rarely hits the database
+        with profiler.phase("parks"):
+            parks = reference.get_parks()
+        park_names = [park['name'] for park in parks]
+        
+        selected_park = st.selectbox("Choose a park", park_names)
+        if selected_park:
+            st.session_state.selected_park = selected_park
+            # Update URL immediately when park is selected
+            update_query_params()
+            
+        if st.button("Continue to Attraction Selection"):
+            st.session_state.page = "Attraction Selection"
+            update_query_params()
+            st.rerun()
+        
+        # Or skip choosing rides and rank every ride in the resort
+        if st.button("Best Rides Right Now"):
+            st.session_state.page = "Best Rides"
+            update_query_params()
+            st.rerun()
+    except Exception as e:
+        st.error(f"Error fetching parks: {str(e)}")
 
 elif st.session_state.page == "Attraction Selection":
     st.header("Select Attractions")
@@ -121,47 +487,114 @@ elif st.session_state.page == "Attraction Selection":
         update_query_params()
         st.rerun()
     
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # First get the attraction type IDs for restaurants and shows
-                cur.execute("""
-                    SELECT id FROM parks.attraction_type 
-                    WHERE type_name IN ('Restaurant', 'Show')
-                """)
-                excluded_type_ids = [row['id'] for row in cur.fetchall()]
-                
-                # Then use these IDs to filter attractions
-                cur.execute("""
-                    SELECT a.id, a.name 
-                    FROM parks.attraction a
-                    JOIN parks.park p ON a.park_id = p.id
-                    WHERE p.name = %s 
-                    AND a.attraction_type_id = 2
-                    ORDER BY a.name
-                """, (st.session_state.selected_park,))
-                attractions = cur.fetchall()
-                
-                attraction_options = {attraction['id']: attraction['name'] for attraction in attractions}
-                selected_attraction_ids = st.multiselect(
-                    "Choose attractions (rides)",
-                    options=list(attraction_options.keys()),
-                    format_func=lambda x: attraction_options[x],
-                    default=st.session_state.selected_attractions
+    try:
+        with profiler.phase("attractions"):
+            # First get the attraction type IDs for restaurants and shows
+            excluded_type_ids = reference.get_excluded_type_ids()
+            
+            # Then get the rides in the selected park (both lookups are cached across sessions)
+            attractions = reference.get_park_attractions(st.session_state.selected_park)
+        
+        attraction_options = {attraction['id']: attraction['name'] for attraction in attractions}
+        selected_attraction_ids = st.multiselect(
+            "Choose attractions (rides)",
+            options=list(attraction_options.keys()),
+            format_func=lambda x: attraction_options[x],
+            default=st.session_state.selected_attractions
+        )
+        
+        if selected_attraction_ids:
+            if st.button("View Wait Times"):
+                st.session_state.selected_attractions = selected_attraction_ids
+                st.session_state.page = "Wait Times"
+                update_query_params()
+                st.rerun()
+            
+    except Exception as e:
+        st.error(f"Error fetching attractions: {str(e)}")
+
+elif st.session_state.page == "Best Rides":
+    import numpy as np
+    import pandas as pd
+    import assessment
+    
+    st.header("Best Rides Right Now")
+    
+    # Add a back button
+    if st.button("← Back to Park Selection"):
+        st.session_state.page = "Park Selection"
+        update_query_params()
+        st.rerun()
+    
+    try:
+        with profiler.phase("destinations"):
+            destinations = reference.get_destinations()
+            parks = reference.get_parks()
+        destination_names = {destination['id']: destination['name'] for destination in destinations}
+        destination_ids = list(destination_names.keys())
+        
+        # Start on the destination of the selected park, if there is one
+        park_destinations = {park['name']: park['destination_id'] for park in parks}
+        selected_destination = park_destinations.get(st.session_state.selected_park)
+        selected_destination_id = st.selectbox(
+            "Choose a destination",
+            options=destination_ids,
+            format_func=lambda x: destination_names[x],
+            index=destination_ids.index(selected_destination) if selected_destination in destination_ids else 0
+        )
+        
+        # Every ride in the destination, from the shared park snapshots
+        with profiler.phase("latest_waits"):
+            current_wait_times = waits.get_destination_waits(selected_destination_id)
+        
+        if current_wait_times:
+            window_start = baselines.window_start()
+            
+            # One baseline lookup and one assessment pass for the whole destination
+            with profiler.phase("baselines"):
+                baseline_rows = get_session_baselines(current_wait_times, window_start)
+            with profiler.phase("assessment"):
+                ranked = assessment.assess_waits(pd.DataFrame(current_wait_times), baseline_rows)
+            
+            with profiler.phase("render"):
+                operating = ranked[~ranked["Non-Operating"]]
+                wait = operating['Wait Time (minutes)']
+                table = pd.DataFrame({
+                    "Attraction": operating["Attraction"],
+                    "Park": operating["Park"],
+                    "Assessment": operating["Badge"],
+                    "Current Wait": np.where(
+                        wait == assessment.WALK_ON_WAIT,
+                        "Walk on",
+                        wait.map(lambda w: "N/A" if pd.isna(w) else f"{int(w)} min")
+                    ),
+                    f"{baselines.LABEL} Wait": operating["Avg Wait (Same Time)"],
+                    f"% of {baselines.LABEL}": operating["% of Average"].where(
+                        operating["% of Average"] < assessment.NO_PERCENTAGE
+                    ),
+                })
+                # A table rather than cards, since a resort has hundreds of rides
+                st.dataframe(
+                    table,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        f"{baselines.LABEL} Wait": st.column_config.NumberColumn(format="%.0f min"),
+                        f"% of {baselines.LABEL}": st.column_config.NumberColumn(format="%.1f%%"),
+                    }
                 )
                 
-                if selected_attraction_ids:
-                    if st.button("View Wait Times"):
-                        st.session_state.selected_attractions = selected_attraction_ids
-                        st.session_state.page = "Wait Times"
-                        update_query_params()
-                        st.rerun()
-                    
-        except Exception as e:
-            st.error(f"Error fetching attractions: {str(e)}")
-        finally:
-            conn.close()
+                not_operating = len(ranked) - len(operating)
+                if not_operating:
+                    st.caption(f"{not_operating} {'ride is' if not_operating == 1 else 'rides are'} not operating right now")
+                st.caption(
+                    f"Ranked by current wait as a percentage of the {baselines.DESCRIPTION} for the same day of week "
+                    f"and time of day (±1 hour) over the past {baselines.WINDOW_DAYS} days"
+                )
+        else:
+            st.info("No wait times available for this destination")
+    except Exception as e:
+        st.error(f"Error ranking rides: {str(e)}")
 
 elif st.session_state.page == "Wait Times":
     #st.header("Current Wait Times")
@@ -175,271 +608,19 @@ elif st.session_state.page == "Wait Times":
         update_query_params()
         st.rerun()
     
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get the most recent wait times for selected attractions
-                cur.execute("""
-                    WITH latest_times AS (
-                        SELECT attraction_id, MAX(timestamp) as latest_time
-                        FROM parks.wait
-                        WHERE attraction_id = ANY(%s)
-                        GROUP BY attraction_id
-                    )
-                    SELECT 
-                        a.id as attraction_id,
-                        a.name as "Attraction",
-                        w.stand_by as "Wait Time (minutes)",
-                        w.timestamp as "Last Updated",
-                        s.status as "Status",
-                        EXTRACT(DOW FROM w.timestamp) as day_of_week,
-                        EXTRACT(HOUR FROM w.timestamp) as hour_of_day
-                    FROM parks.wait w
-                    JOIN parks.attraction a ON w.attraction_id = a.id
-                    JOIN parks.attraction_status s ON w.attraction_status_id = s.id
-                    JOIN latest_times lt ON w.attraction_id = lt.attraction_id AND w.timestamp = lt.latest_time
-                    ORDER BY w.stand_by ASC NULLS LAST
-                """, (st.session_state.selected_attractions,))
-                
-                current_wait_times = cur.fetchall()
-                
-                if current_wait_times:
-                    # Get historical wait times for the past 60 days for time-based comparison
-                    sixty_days_ago = datetime.now() - timedelta(days=60)
-                    
-                    # Create DataFrame for current wait times
-                    current_df = pd.DataFrame(current_wait_times)
-                    
-                    # Add column only for time-based assessment
-                    current_df["Time-Based Assessment"] = "N/A"
-                    current_df["Avg Wait (Same Time)"] = None
-                    
-                    # For each attraction, get historical data and analyze
-                    for i, row in current_df.iterrows():
-                        attraction_id = row['attraction_id']
-                        
-                        # Skip the 5-day average calculation
-                        
-                        # Get time-specific historical data 
-                        current_day_of_week = row['day_of_week']
-                        current_hour = row['hour_of_day']
-                        
-                        # Get data from the same day of week and hour (±1 hour) over the last 60 days
-                        cur.execute("""
-                            SELECT 
-                                w.stand_by, 
-                                w.timestamp
-                            FROM parks.wait w
-                            JOIN parks.attraction_status s ON w.attraction_status_id = s.id
-                            WHERE 
-                                w.attraction_id = %s AND
-                                w.timestamp > %s AND
-                                s.status = 'Operating' AND
-                                EXTRACT(DOW FROM w.timestamp) = %s AND
-                                EXTRACT(HOUR FROM w.timestamp) BETWEEN %s AND %s
-                        """, (attraction_id, sixty_days_ago, current_day_of_week, 
-                             max(0, current_hour - 1), min(23, current_hour + 1)))
-                        
-                        time_specific_wait_times = cur.fetchall()
-                        
-                        if time_specific_wait_times:
-                            # Calculate average wait time for same time of day and day of week
-                            time_specific_waits = [hw['stand_by'] for hw in time_specific_wait_times if hw['stand_by'] is not None]
-                            
-                            if time_specific_waits:  # Make sure we have valid wait times
-                                time_avg_wait = sum(time_specific_waits) / len(time_specific_waits)
-                                current_df.at[i, "Avg Wait (Same Time)"] = round(time_avg_wait, 1)
-                                
-                                # Compare current wait with time-specific average
-                                current_wait = row['Wait Time (minutes)']
-                                if current_wait is not None:
-                                    # Calculate percentage of average
-                                    percentage = (current_wait / time_avg_wait) * 100
-                                    current_df.at[i, "% of Average"] = round(percentage, 1)
-                                    
-                                    if current_wait <= time_avg_wait * 0.7:
-                                        time_assessment = "Very Good"
-                                    elif current_wait <= time_avg_wait * 0.9:
-                                        time_assessment = "Good"
-                                    elif current_wait <= time_avg_wait * 1.1:
-                                        time_assessment = "Average"
-                                    elif current_wait <= time_avg_wait * 1.3:
-                                        time_assessment = "Busy"
-                                    else:
-                                        time_assessment = "Very Busy"
-                                    
-                                    current_df.at[i, "Time-Based Assessment"] = time_assessment
-                    
-                    # Add a column to sort by status (down/refurbishment attractions at the end)
-                    current_df["Status_Order"] = current_df["Status"].apply(lambda x: 2 if x.lower() in ["down", "refurbishment"] else 1)
-                    
-                    # Fill NaN values in "% of Average" with a high number for sorting purposes
-                    if "% of Average" in current_df.columns:
-                        current_df["% of Average"] = current_df["% of Average"].fillna(99999)
-                    
-                    # Sort the dataframe by Status_Order first (operating first), then by % of Average
-                    current_df = current_df.sort_values(by=["Status_Order", "% of Average"], ascending=[True, True])
-                    
-                    # Convert day of week number to day name for better display
-                    day_mapping = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 
-                                4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
-                    
-                    # Instead of displaying as a dataframe, create cards for each attraction
-                    st.write("### Best wait times right now?")
-                    
-                    # Create single column for the cards
-                    cols = st.columns(1)
-                    
-                    # Iterate through the attractions and create cards
-                    for idx, row in current_df.iterrows():
-                        # Define card style based on status
-                        card_style = """
-                        {
-                            border: 1px solid #e0e0e0;
-                            border-radius: 10px;
-                            padding: 1rem;
-                            margin-bottom: 1rem;
-                            background-color: white;
-                        }
-                        """
-                        
-                        if row["Status"].lower() in ["down", "refurbishment"]:
-                            card_style = """
-                            {
-                                border: 1px solid #ffcccc;
-                                border-radius: 10px;
-                                padding: 1rem;
-                                margin-bottom: 1rem;
-                                background-color: #fff5f5;
-                            }
-                            """
-                        
-                        # Create the card in the single column
-                        with cols[0]:
-                            with stylable_container(
-                                key=f"card_{idx}",
-                                css_styles=card_style
-                            ):
-                                # Create two columns for the header area - attraction name and assessment
-                                header_col1, header_col2 = st.columns([3, 1])
-                                
-                                with header_col1:
-                                    # Attraction Name as header
-                                    st.markdown(f"#### {row['Attraction']}")
-                                
-                                with header_col2:
-                                    # Check status first
-                                    status_lower = row["Status"].lower()
-                                    is_non_operating = status_lower in ["down", "refurbishment", "closed"]
-                                    
-                                    if is_non_operating:
-                                        # Show status in assessment spot for non-operating rides
-                                        assessment_text = row["Status"]
-                                        assessment_color = "#ff0000"  # Red color for non-operating
-                                    else:
-                                        # Normal assessment logic for operating rides
-                                        if row["Time-Based Assessment"] != "N/A":
-                                            # Check if wait time is -1 for "walk on" status
-                                            if row['Wait Time (minutes)'] == -1:
-                                                assessment_text = "No line, always walk on"
-                                                assessment_color = "#00aa00"  # Green color for walk-on
-                                            else:
-                                                assessment_text = row["Time-Based Assessment"]
-                                                assessment_color = {
-                                                    "Very Good": "#00aa00",
-                                                    "Good": "#88aa00",
-                                                    "Average": "#aaaa00",
-                                                    "Busy": "#aa8800",
-                                                    "Very Busy": "#aa0000"
-                                                }.get(row["Time-Based Assessment"], "#000000")
-                                    
-                                    assessment_style = f"""
-                                        padding: 4px 8px;
-                                        border-radius: 4px;
-                                        background-color: {assessment_color}20;
-                                        color: {assessment_color};
-                                        font-weight: bold;
-                                        text-align: center;
-                                        display: inline-block;
-                                        width: 100%;
-                                        font-size: 0.9em;
-                                    """
-                                    
-                                    st.markdown(
-                                        f"<div style='{assessment_style}'>{assessment_text}</div>",
-                                        unsafe_allow_html=True
-                                    )
-
-                                # Always visible wait time row
-                                # Only show wait time if the attraction is operating
-                                status_lower = row["Status"].lower()
-                                is_non_operating = status_lower in ["down", "refurbishment", "closed"]
-                                
-                                if not is_non_operating:
-                                    wait_col1, wait_col2 = st.columns([1, 2])
-                                    with wait_col1:
-                                        # Current Wait Time
-                                        wait_time = row['Wait Time (minutes)']
-                                        if pd.isna(wait_time):
-                                            wait_time = "N/A"
-                                        elif wait_time == -1:
-                                            wait_time = "Walk on"
-                                        else:
-                                            wait_time = f"{int(wait_time)} min"
-                                        st.markdown(f"**Current Wait:** {wait_time}")
-
-                                # Expandable section
-                                with st.expander("More Details"):
-                                    col1, col2 = st.columns(2)
-                                    
-                                    with col1:
-                                        # Average Wait Time
-                                        avg_wait = row['Avg Wait (Same Time)']
-                                        if pd.isna(avg_wait):
-                                            avg_wait = "N/A"
-                                        else:
-                                            avg_wait = f"{int(avg_wait)} min"
-                                        st.markdown(f"**Average Wait:** {avg_wait}")
-                                        
-                                        # Percentage of Average
-                                        if "% of Average" in row and not pd.isna(row["% of Average"]):
-                                            percentage = row["% of Average"]
-                                            if percentage < 99999:  # Check if it's not our NaN replacement value
-                                                st.markdown(f"**% of Average:** {percentage:.1f}%")
-                                    
-                                    with col2:
-                                        # Last Updated
-                                        st.markdown(f"*Updated: {row['Last Updated'].strftime('%I:%M %p')}*")
-                    
-                    # Display a simplified legend explaining the assessment categories in an expander
-                    with st.expander("Wait Time Assessment Legend"):
-                        st.markdown("""
-                        - **Very Good**: Current wait is at least 30% below the average
-                        - **Good**: Current wait is 10-30% below the average
-                        - **Average**: Current wait is within 10% of the average
-                        - **Busy**: Current wait is 10-30% above the average
-                        - **Very Busy**: Current wait is more than 30% above the average
-                        
-                        **Time-Based Assessment**: Compares to the average for the same day of week and similar time of day (±1 hour) over the past 60 days
-                        """)
-                    
-                    # Add a button to start over
-                    if st.button("Start Over"):
-                        st.session_state.page = "Park Selection"
-                        st.session_state.selected_park = None
-                        st.session_state.selected_attractions = []
-                        update_query_params()
-                        st.rerun()
-                else:
-                    st.info("No wait times available for selected attractions")
-                    
-                    # Add a button to go back and select different attractions
-                    if st.button("Select Different Attractions"):
-                        st.session_state.page = "Attraction Selection"
-                        update_query_params()
-                        st.rerun()
-        except Exception as e:
-            st.error(f"Error fetching wait times: {str(e)}")
-        finally:
-            conn.close() 
\ No newline at end of file
+    # Opt-in auto refresh of just the card list
+    live_mode = st.toggle(
+        "Live updates",
+        key="live_mode",
+        help=f"Refresh wait times every {LIVE_REFRESH_SECONDS} seconds"
+    )
+    if live_mode:
+        st.fragment(run_every=LIVE_REFRESH_SECONDS)(show_wait_times)(profiler)
+    else:
+        show_wait_times(profiler)
+
+# Log this rerun's breakdown (the Wait Times page does this itself, so that
+# live refreshes of its fragment are covered too)
+if not profiler.finished:
+    profiler.finish()
+    instrumentation.show_panel(profiler)
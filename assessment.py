@@ -0,0 +1,97 @@
+"""Column-wise time-based assessment and ranking of current wait times.
+
+Nothing here touches Streamlit or the database, so it can be run over a
+single park's selection or every attraction in a destination at once.
+"""
+import numpy as np
+import pandas as pd
+
+# Current wait as a fraction of the same-time average, upper bound of each label
+ASSESSMENT_THRESHOLDS = [
+    (0.7, "Very Good"),
+    (0.9, "Good"),
+    (1.1, "Average"),
+    (1.3, "Busy"),
+]
+ABOVE_THRESHOLDS = "Very Busy"
+NOT_ASSESSED = "N/A"
+
+ASSESSMENT_COLORS = {
+    "Very Good": "#00aa00",
+    "Good": "#88aa00",
+    "Average": "#aaaa00",
+    "Busy": "#aa8800",
+    "Very Busy": "#aa0000",
+}
+DEFAULT_COLOR = "#000000"
+NON_OPERATING_COLOR = "#ff0000"
+WALK_ON_COLOR = "#00aa00"
+WALK_ON_TEXT = "No line, always walk on"
+
+# Statuses that replace the assessment badge, and those that sort to the end
+NON_OPERATING_STATUSES = ["down", "refurbishment", "closed"]
+SORT_LAST_STATUSES = ["down", "refurbishment"]
+
+# A wait of -1 means the attraction never has a line
+WALK_ON_WAIT = -1
+
+# "% of Average" value used when there is nothing to compare against
+NO_PERCENTAGE = 99999
+
+BASELINE_COLUMNS = ['attraction_id', 'avg_wait', 'sample_count', 'pct_of_avg']
+
+
+def assess_waits(current, baselines):
+    """Assess and rank current waits against their same-time baselines.
+
+    `current` has one row per attraction with attraction_id, "Status" and
+    "Wait Time (minutes)"; `baselines` has the BASELINE_COLUMNS returned by
+    waits.fetch_baselines. Returns a copy of `current` with these columns
+    added, sorted operating attractions first and then by "% of Average":
+
+    - "Avg Wait (Same Time)": baseline average rounded to 0.1 (NaN if none)
+    - "% of Average": current wait as a percentage of it, NO_PERCENTAGE if none
+    - "Time-Based Assessment": "Very Good" ... "Very Busy", or "N/A"
+    - "Status_Order": 2 for down/refurbishment attractions, 1 otherwise
+    - "Non-Operating": whether the status replaces the assessment badge
+    - "Badge" / "Badge Color": what the attraction's card shows
+    """
+    df = current.copy()
+    baselines = (
+        pd.DataFrame(baselines, columns=BASELINE_COLUMNS)
+        .drop_duplicates('attraction_id')
+        .set_index('attraction_id')
+    )
+    sample_count = df['attraction_id'].map(baselines['sample_count']).astype(float)
+    has_baseline = sample_count > 0
+    avg_wait = df['attraction_id'].map(baselines['avg_wait']).astype(float).where(has_baseline)
+    pct_of_avg = df['attraction_id'].map(baselines['pct_of_avg']).astype(float)
+    wait = pd.to_numeric(df['Wait Time (minutes)'], errors='coerce').astype(float)
+
+    assessed = has_baseline & wait.notna() & pct_of_avg.notna()
+    labels = np.select(
+        [wait <= avg_wait * threshold for threshold, _ in ASSESSMENT_THRESHOLDS],
+        [label for _, label in ASSESSMENT_THRESHOLDS],
+        default=ABOVE_THRESHOLDS,
+    )
+    df["Time-Based Assessment"] = np.where(assessed, labels, NOT_ASSESSED)
+    df["Avg Wait (Same Time)"] = avg_wait.round(1)
+    df["% of Average"] = pct_of_avg.where(assessed).round(1).fillna(NO_PERCENTAGE)
+
+    status = df['Status'].str.lower()
+    df["Status_Order"] = np.where(status.isin(SORT_LAST_STATUSES), 2, 1)
+    df["Non-Operating"] = status.isin(NON_OPERATING_STATUSES)
+
+    walk_on = assessed & (wait == WALK_ON_WAIT)
+    df["Badge"] = np.select(
+        [df["Non-Operating"], walk_on],
+        [df['Status'], WALK_ON_TEXT],
+        default=df["Time-Based Assessment"],
+    )
+    df["Badge Color"] = np.select(
+        [df["Non-Operating"], walk_on],
+        [NON_OPERATING_COLOR, WALK_ON_COLOR],
+        default=df["Time-Based Assessment"].map(ASSESSMENT_COLORS).fillna(DEFAULT_COLOR),
+    )
+
+    return df.sort_values(by=["Status_Order", "% of Average"], ascending=[True, True])
@@ -0,0 +1,57 @@
+"""Where the Wait Times baselines come from, as configured in the environment.
+
+`fetch()` returns the same-time baselines of a set of latest wait rows, in
+waits.fetch_baselines' format, from the local history store when
+`history_store_path` is set and from the database rollup otherwise, using
+the statistic chosen with `baseline_statistic`. Shared by app.py and api.py.
+"""
+import os
+from datetime import datetime, timedelta
+
+import db
+import rollup
+import waits
+
+# Number of days of history the time-based assessment compares against
+WINDOW_DAYS = int(os.getenv('baseline_window_days', '60'))
+
+# What each current wait is compared with: the mean of the same-time waits,
+# or their median, 75th or 90th percentile from the quantile sketches, which
+# breakdown spikes and other outliers barely move
+STATISTIC = os.getenv('baseline_statistic', 'mean')
+QUANTILE = {'mean': None, 'median': 0.5, 'p75': 0.75, 'p90': 0.9}[STATISTIC]
+DESCRIPTION = {
+    'mean': 'average',
+    'median': 'median wait',
+    'p75': '75th percentile wait',
+    'p90': '90th percentile wait',
+}[STATISTIC]
+# The statistic's name in labels, e.g. "Median Wait" and "% of Median"
+LABEL = {
+    'mean': 'Average',
+    'median': 'Median',
+    'p75': '75th Percentile',
+    'p90': '90th Percentile',
+}[STATISTIC]
+
+# Local Parquet export of parks.wait to compute baselines from instead of the
+# database rollup (see history_store.py); unset to use the rollup
+HISTORY_STORE_PATH = os.getenv('history_store_path')
+
+
+def window_start(now=None):
+    return (now or datetime.now()) - timedelta(days=WINDOW_DAYS)
+
+
+def fetch(current_wait_times, since):
+    """Baselines of `current_wait_times` over the waits recorded since `since`."""
+    if HISTORY_STORE_PATH:
+        # Computed locally from the Parquet history export
+        import history_store
+        return history_store.fetch_baselines(HISTORY_STORE_PATH, current_wait_times, since, quantile=QUANTILE)
+    # Top up the rollup first if this process hasn't refreshed it lately
+    with db.connection() as conn:
+        rollup.refresh_if_stale(conn)
+        if QUANTILE is None:
+            return waits.fetch_baselines(conn, current_wait_times, since)
+        return waits.fetch_quantile_baselines(conn, current_wait_times, since, QUANTILE)
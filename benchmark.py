@@ -0,0 +1,170 @@
+"""Benchmark the data paths behind app.py's three pages.
+
+Loads synthetic data (see synthetic.py) into a scratch Postgres database,
+then times what each page does to fetch and prepare its data, without
+Streamlit:
+
+- park_selection: reference.get_parks()
+- attraction_selection: the attraction type and per-park ride lookups
+- wait_times: latest waits, baselines and the assessment, with baselines
+  from baselines.fetch() as the page gets them
+- best_rides: the same for every ride in the destination (Best Rides page)
+
+Every path runs "cold" (shared caches dropped before each iteration) and
+"warm" (caches kept). Results, with latency percentiles, query counts and
+rows and bytes fetched per iteration, are written as JSON. Pass `--compare`
+an earlier result file to print how the median latencies moved.
+
+    python benchmark.py --db-url postgresql://localhost/wilck_bench --days 90 --output bench.json
+
+The database given with --db-url is wiped when data is generated.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import assessment
+import baselines
+import db
+import reference
+import synthetic
+import waits
+
+
+def _percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'max_ms': float(ms.max()),
+    }
+
+
+def measure(path, iterations, before=None):
+    """Run `path()` `iterations` times, calling `before()` untimed ahead of each run."""
+    latencies = []
+    with db.track_queries() as stats:
+        for _ in range(iterations):
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            path()
+            latencies.append(time.perf_counter() - started)
+    result = _percentiles(latencies)
+    result.update({
+        'iterations': iterations,
+        'queries_per_iteration': stats.queries / iterations,
+        'rows_per_iteration': stats.rows / iterations,
+        'bytes_per_iteration': stats.bytes / iterations,
+    })
+    return result
+
+
+def page_paths(selected):
+    """The data path of each page, as callables, for the first synthetic park."""
+    park_name = reference.get_parks()[0]['name']
+    ride_ids = [row['id'] for row in reference.get_park_attractions(park_name)][:selected]
+    destination_id = reference.get_destinations()[0]['id']
+
+    def park_selection():
+        reference.get_parks()
+
+    def attraction_selection():
+        reference.get_excluded_type_ids()
+        reference.get_park_attractions(park_name)
+
+    def wait_times():
+        current_wait_times = waits.get_latest_waits(ride_ids)
+        wait_baselines = baselines.fetch(current_wait_times, baselines.window_start())
+        assessment.assess_waits(pd.DataFrame(current_wait_times), wait_baselines)
+
+    def best_rides():
+        current_wait_times = waits.get_destination_waits(destination_id)
+        wait_baselines = baselines.fetch(current_wait_times, baselines.window_start())
+        assessment.assess_waits(pd.DataFrame(current_wait_times), wait_baselines)
+
+    return {
+        'park_selection': park_selection,
+        'attraction_selection': attraction_selection,
+        'wait_times': wait_times,
+        'best_rides': best_rides,
+    }
+
+
+def drop_caches():
+    reference.invalidate()
+    waits.snapshot_cache.invalidate()
+
+
+def compare(results, previous):
+    print(f"{'path':<22}{'mode':<6}{'before p50':>12}{'after p50':>12}{'change':>10}")
+    for name, modes in results['paths'].items():
+        for mode, result in modes.items():
+            before = previous.get('paths', {}).get(name, {}).get(mode)
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+            print(f"{name:<22}{mode:<6}{before['p50_ms']:>10.2f}ms{result['p50_ms']:>10.2f}ms{change:>+9.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    synthetic.add_arguments(parser, days=60, interval=15)
+    parser.add_argument('--selected', type=int, default=25, help="rides selected on the Wait Times page")
+    parser.add_argument('--window-days', type=int, default=baselines.WINDOW_DAYS,
+                        help="baseline lookback (default: baseline_window_days)")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    parser.add_argument('--compare', help="earlier JSON results to compare median latencies with")
+    args = parser.parse_args(argv)
+
+    baselines.WINDOW_DAYS = args.window_days
+
+    generated = synthetic.prepare(args)
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM parks.wait")
+            wait_rows = cur.fetchone()[0]
+        conn.rollback()
+
+    paths = page_paths(args.selected)
+    results = {
+        'created_on': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            **{k: v for k, v in vars(args).items() if k not in ('db_url', 'output', 'compare')},
+            'statistic': baselines.STATISTIC,
+            'history_store': bool(baselines.HISTORY_STORE_PATH),
+        },
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'data': {'wait_rows': wait_rows, 'generated': generated},
+        'paths': {},
+    }
+    for name, path in paths.items():
+        path()  # warm-up: imports, pool connections, rollup check
+        results['paths'][name] = {
+            'cold': measure(path, args.iterations, before=drop_caches),
+            'warm': measure(path, args.iterations),
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe cache whose entries expire `ttl` seconds after being loaded.
+
+    One instance is shared by every session in the process. Values are handed
+    out as-is, so callers must treat them as read-only. Expired entries are
+    dropped whenever a value is stored, unless `keep_stale` keeps them around
+    for `peek()`. With `maxsize` set, storing beyond it evicts the least
+    recently used entries.
+    """
+
+    def __init__(self, ttl, maxsize=None, keep_stale=False):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.keep_stale = keep_stale
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # key -> [lock, number of callers holding or waiting on it]
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for `key`, calling `loader()` on a miss.
+
+        Concurrent misses on the same key are single-flighted: one caller
+        runs the loader while the others wait for its result. `ttl` overrides
+        the cache-wide lifetime for this entry. Exceptions raised by the
+        loader propagate and nothing is cached.
+        """
+        with self._lock:
+            value = self._fresh_value(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                with self._lock:
+                    # Another caller may have loaded it while we were waiting
+                    value = self._fresh_value(key)
+                    if value is not _MISSING:
+                        self.hits += 1
+                        return value
+                    self.misses += 1
+                value = loader()
+                with self._lock:
+                    self._store(key, time.monotonic() + (self.ttl if ttl is None else ttl), value)
+                return value
+        finally:
+            with self._lock:
+                # The last caller out drops the lock, so only keys being
+                # loaded right now have one
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def peek(self, key):
+        """Return the value stored for `key` even if it has expired, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1]
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when `key` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _fresh_value(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+        return _MISSING
+
+    def _store(self, key, expires, value):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        if not self.keep_stale:
+            now = time.monotonic()
+            for stale_key in [k for k, (entry_expires, _) in self._entries.items() if entry_expires <= now]:
+                del self._entries[stale_key]
+        while self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the acquire timeout."""
+
+
+class QueryStats:
+    """Queries run, rows fetched and time spent while a tracker is active.
+
+    `bytes` approximates the data transferred as the length of each fetched
+    value's text form, which is what the server sends. `acquire_seconds` is
+    the time spent waiting for (and health-checking) pooled connections.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.connections = 0
+        self.acquire_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'connections': self.connections,
+            'acquire_seconds': self.acquire_seconds,
+        }
+
+
+_trackers = threading.local()
+
+
+@contextmanager
+def track_queries():
+    """Count the queries this thread runs on pooled connections inside the block.
+
+    Blocks can be nested; every active tracker sees each query. Outside of one
+    the only cost per query is a thread-local lookup.
+    """
+    stats = QueryStats()
+    stack = _trackers.__dict__.setdefault('stack', [])
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+
+
+def _active_trackers():
+    return getattr(_trackers, 'stack', None)
+
+
+def _text_size(rows):
+    return sum(
+        len(str(value))
+        for row in rows
+        for value in (row.values() if isinstance(row, dict) else row)
+        if value is not None
+    )
+
+
+class _TrackingCursorMixin:
+    def execute(self, query, vars=None):
+        trackers = _active_trackers()
+        if not trackers:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - started
+            for stats in trackers:
+                stats.queries += 1
+                stats.seconds += elapsed
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._track_rows([row])
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany() if size is None else super().fetchmany(size)
+        self._track_rows(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._track_rows(rows)
+        return rows
+
+    def _track_rows(self, rows):
+        trackers = _active_trackers()
+        if trackers and rows:
+            size = _text_size(rows)
+            for stats in trackers:
+                stats.rows += len(rows)
+                stats.bytes += size
+
+
+@lru_cache(maxsize=None)
+def _tracking_cursor_class(cursor_factory):
+    return type('Tracking' + cursor_factory.__name__, (_TrackingCursorMixin, cursor_factory), {})
+
+
+class TrackingConnection(psycopg2.extensions.connection):
+    """Connection whose cursors, whatever their factory, report to `track_queries()`."""
+
+    def cursor(self, *args, **kwargs):
+        cursor_factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _tracking_cursor_class(cursor_factory)
+        return super().cursor(*args, **kwargs)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of PostgreSQL connections.
+
+    Holds at most `maxconn` connections, idle or borrowed; `minconn` are
+    opened up front and the rest on demand, and every returned connection is
+    kept for reuse. When all of them are borrowed, callers wait up to
+    `timeout` seconds for one to come back. Idle connections that have sat
+    unused for longer than `ping_after` seconds are checked with a
+    `SELECT 1` before being handed out, and dead ones (e.g. after a database
+    restart) are discarded until a healthy or newly opened one turns up.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0, ping_after=5.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        # (connection, time returned), most recently returned last
+        self._idle = [(self._connect(), time.monotonic()) for _ in range(minconn)]
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn, connection_factory=TrackingConnection)
+
+    def getconn(self):
+        trackers = _active_trackers()
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = self._connect()
+                    break
+                conn, last_used = idle
+                if self._is_healthy(conn, last_used):
+                    break
+                self._close(conn)
+        except Exception:
+            self._slots.release()
+            raise
+        if trackers:
+            elapsed = time.perf_counter() - started
+            for stats in trackers:
+                stats.connections += 1
+                stats.acquire_seconds += elapsed
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            # A connection that hit a network/server error is marked closed by
+            # psycopg2; drop it rather than returning it to the pool.
+            if not (close or conn.closed):
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        close = True
+            if close or conn.closed:
+                self._close(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it from the environment on first use.
+
+    Settings are read from `db_url`, `db_pool_min`, `db_pool_max`,
+    `db_pool_timeout` (seconds to wait for a free connection) and
+    `db_pool_ping_after` (idle seconds before a connection is re-checked).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.getenv('db_url'),
+                    minconn=int(os.getenv('db_pool_min', '1')),
+                    maxconn=int(os.getenv('db_pool_max', '10')),
+                    timeout=float(os.getenv('db_pool_timeout', '10')),
+                    ping_after=float(os.getenv('db_pool_ping_after', '5')),
+                )
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the duration of a `with` block."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
@@ -0,0 +1,126 @@
+"""Check that the app's hot queries are planned as index lookups.
+
+Loads a realistically sized synthetic history (see synthetic.py) into a
+scratch Postgres database, runs ANALYZE, then EXPLAINs the queries waits.py
+sends for the Wait Times page:
+
+- latest_waits: the newest row of every attraction in a park
+- waits_since: the snapshot refresh, rows newer than the previous snapshot
+- baselines: the parks.wait_baseline lookup
+- sketches: the parks.wait_sketch lookup behind median/p75/p90 baselines
+
+A query fails the check when its plan reads parks.wait, parks.wait_baseline
+or parks.wait_sketch with a sequential scan, or when a latest-wait query
+does not use the (attraction_id, timestamp) index from migrations/002. The
+exit status is non-zero if any query fails.
+
+    python explain_check.py --db-url postgresql://localhost/wilck_bench --days 365
+
+The database given with --db-url is wiped when data is generated.
+"""
+import argparse
+import json
+import sys
+from datetime import timedelta
+
+import baselines
+import db
+import synthetic
+import waits
+
+WAIT_INDEX = 'wait_attraction_id_timestamp_idx'
+LARGE_TABLES = ('wait', 'wait_baseline', 'wait_sketch')
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def explain(conn, sql, params, analyze=False):
+    """The JSON plan of `sql`, optionally executed for actual timings."""
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    with conn.cursor() as cur:
+        cur.execute(f"EXPLAIN ({options}) " + sql, params)
+        result = cur.fetchone()[0]
+    conn.rollback()
+    # psycopg2 decodes the json column unless the server sent it as text
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+def check(name, explained, required_index=None):
+    """Print a plan summary and return the list of problems found in it."""
+    nodes = list(_plan_nodes(explained['Plan']))
+    problems = [
+        f"sequential scan on parks.{node['Relation Name']}"
+        for node in nodes
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in LARGE_TABLES
+    ]
+    indexes = sorted({node['Index Name'] for node in nodes if 'Index Name' in node})
+    if required_index and required_index not in indexes:
+        problems.append(f"{required_index} not used")
+
+    summary = f"{name:<14}cost {explained['Plan']['Total Cost']:>12.1f}"
+    if 'Execution Time' in explained:
+        summary += f"  {explained['Execution Time']:>9.2f}ms"
+    print(f"{summary}  {'FAIL' if problems else 'ok'}")
+    print(f"{'':<14}indexes: {', '.join(indexes) or '-'}")
+    for problem in problems:
+        print(f"{'':<14}! {problem}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    synthetic.add_arguments(parser, days=365, interval=10)
+    parser.add_argument('--analyze', action='store_true', help="run the queries for actual timings")
+    parser.add_argument('--verbose', action='store_true', help="print the full JSON plans")
+    args = parser.parse_args(argv)
+
+    generated = synthetic.prepare(args)
+    if generated:
+        print(f"Generated {generated['wait_rows']} parks.wait rows in {generated['seconds']:.1f}s")
+
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MIN(id) FROM parks.park")
+            park_id = cur.fetchone()[0]
+        conn.rollback()
+        snapshot = waits._fetch_park_snapshot(conn, park_id)
+        conn.rollback()
+        since = max(row['Last Updated'] for row in snapshot) - timedelta(seconds=waits.COLLECTOR_INTERVAL)
+        # The baseline window the app looks back over, from the latest samples
+        window_start = baselines.window_start(since)
+
+        queries = [
+            ('latest_waits', waits.LATEST_WAITS_SQL, (park_id,), WAIT_INDEX),
+            ('waits_since', waits.WAITS_SINCE_SQL, (since, park_id), WAIT_INDEX),
+            ('baselines', waits.BASELINES_SQL, (
+                [int(row['attraction_id']) for row in snapshot],
+                [int(row['day_of_week']) for row in snapshot],
+                [int(row['hour_of_day']) for row in snapshot],
+                [row['Wait Time (minutes)'] for row in snapshot],
+                window_start,
+            ), None),
+            ('sketches', waits.SKETCHES_SQL, (
+                [int(row['attraction_id']) for row in snapshot],
+                [int(row['day_of_week']) for row in snapshot],
+                [int(row['hour_of_day']) for row in snapshot],
+                window_start,
+            ), None),
+        ]
+        failures = 0
+        for name, sql, params, required_index in queries:
+            explained = explain(conn, sql, params, analyze=args.analyze)
+            failures += bool(check(name, explained, required_index))
+            if args.verbose:
+                print(json.dumps(explained, indent=2, default=str))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Local columnar copy of the parks.wait history.
+
+`export()` appends the parks.wait rows added since its previous run to a
+Parquet dataset partitioned by park and date (hive layout, e.g.
+`park_id=3/date=2025-03-14/part-....parquet`). `fetch_baselines()` computes
+the same baselines as waits.fetch_baselines from those files, memory-mapped
+and column-wise, so long lookbacks never touch the database.
+
+Point the app at a store with the `history_store_path` environment variable,
+and keep it current with `python history_store.py export`.
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+from dotenv import load_dotenv
+
+import db
+import rollup
+
+SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('attraction_id', pa.int64()),
+    ('attraction_status_id', pa.int64()),
+    ('status', pa.string()),
+    ('stand_by', pa.int64()),
+    ('timestamp', pa.timestamp('us')),
+    ('created_on', pa.timestamp('us')),
+    ('park_id', pa.int64()),
+    ('date', pa.date32()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([('park_id', pa.int64()), ('date', pa.date32())]),
+    flavor='hive',
+)
+STATE_FILE = '_state.json'
+
+# Rows pulled from the server-side cursor and written per batch
+BATCH_SIZE = 100000
+
+
+def _read_state(root):
+    try:
+        with open(os.path.join(root, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'last_wait_id': 0}
+
+
+def _write_state(root, state):
+    path = os.path.join(root, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+def append(root, df):
+    """Write a batch of wait rows (columns as in SCHEMA, `date` optional) to the store."""
+    if len(df) == 0:
+        return
+    df = df.copy()
+    if 'date' not in df.columns:
+        df['date'] = pd.to_datetime(df['timestamp']).dt.date
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    # Name files after the first id in the batch, so re-running an
+    # interrupted export overwrites its partial files instead of duplicating them
+    ds.write_dataset(
+        table,
+        root,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=f"part-{int(df['id'].min())}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+def _settled_wait_id(conn, state, settle):
+    """The id up to which rows can be exported without missing late commits.
+
+    Works like the rollup's high-water mark (see rollup.py): the highest id
+    seen is kept in the state as pending and exported up to once the
+    transactions running at the time have finished.
+    """
+    target = state['last_wait_id']
+    pending = state.get('pending')
+    with conn.cursor() as cur:
+        if pending is not None and rollup.horizon_settled(cur, pending['xmax'], pending['recorded_on'], settle):
+            target, pending = max(target, pending['wait_id']), None
+        if pending is None:
+            max_wait_id, xmax, now = rollup.wait_id_horizon(cur)
+            if max_wait_id > target:
+                pending = {'wait_id': max_wait_id, 'xmax': xmax, 'recorded_on': now.isoformat()}
+    conn.rollback()
+    if pending is not None and settle <= 0:
+        # Settles straight away when nothing else is writing
+        with conn.cursor() as cur:
+            if rollup.horizon_settled(cur, pending['xmax'], pending['recorded_on'], settle):
+                target, pending = pending['wait_id'], None
+        conn.rollback()
+    state['pending'] = pending
+    return target
+
+
+def export(conn, root, batch_size=BATCH_SIZE, settle=None):
+    """Append the parks.wait rows added since the previous export. Returns the row count.
+
+    Rows whose ids were first seen less than `settle` seconds ago (default
+    `rollup.settle_seconds()`), or while lower ids could still commit, are
+    left for the next export.
+    """
+    os.makedirs(root, exist_ok=True)
+    state = _read_state(root)
+    high_wait_id = _settled_wait_id(conn, state, rollup.settle_seconds() if settle is None else settle)
+    exported = 0
+    # Named cursor so rows stream from the server instead of loading at once
+    with conn.cursor(name='history_export') as cur:
+        cur.itersize = batch_size
+        cur.execute("""
+            SELECT
+                w.id, w.attraction_id, w.attraction_status_id, s.status,
+                w.stand_by, w.timestamp, w.created_on, a.park_id
+            FROM parks.wait w
+            JOIN parks.attraction a ON w.attraction_id = a.id
+            JOIN parks.attraction_status s ON w.attraction_status_id = s.id
+            WHERE w.id > %s AND w.id <= %s
+            ORDER BY w.id
+        """, (state['last_wait_id'], high_wait_id))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = pd.DataFrame(rows, columns=[c for c in SCHEMA.names if c != 'date'])
+            append(root, batch)
+            state['last_wait_id'] = int(batch['id'].max())
+            _write_state(root, state)
+            exported += len(batch)
+    conn.rollback()
+    # Ids up to the mark that weren't exported were deleted or rolled back
+    state['last_wait_id'] = max(state['last_wait_id'], high_wait_id)
+    _write_state(root, state)
+    return exported
+
+
+def read_history(root, attraction_ids=None, since=None, columns=None):
+    """Load wait rows from the store as a DataFrame, memory-mapping the files.
+
+    Partitions and row groups outside `since` or `attraction_ids` are skipped
+    without being read.
+    """
+    dataset = ds.dataset(
+        root,
+        format='parquet',
+        partitioning=PARTITIONING,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True,
+    )
+    conditions = []
+    if attraction_ids is not None:
+        conditions.append(ds.field('attraction_id').isin([int(aid) for aid in attraction_ids]))
+    if since is not None:
+        since = pd.Timestamp(since)
+        conditions.append(ds.field('date') >= pa.scalar(since.date(), pa.date32()))
+        conditions.append(ds.field('timestamp') > pa.scalar(since.to_pydatetime(), pa.timestamp('us')))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def compact(history):
+    """Drop consecutive duplicate rows the way the compactor lambda does.
+
+    A row is kept when its status or stand_by differs from the previous row
+    for the same attraction on the same created_on day.
+    """
+    history = history.sort_values(['attraction_id', 'timestamp'], kind='stable')
+    created_day = history['created_on'].dt.normalize()
+    same_run = (
+        (history['attraction_id'] == history['attraction_id'].shift()) &
+        (created_day == created_day.shift()) &
+        (history['attraction_status_id'] == history['attraction_status_id'].shift()) &
+        (history['stand_by'] == history['stand_by'].shift())
+    )
+    return history[~same_run]
+
+
+def fetch_baselines(root, current_wait_times, since, quantile=None):
+    """Baselines computed from the local store, in waits.fetch_baselines' format.
+
+    With `quantile` set, `avg_wait` is that quantile of the waits instead of
+    their mean, as from waits.fetch_quantile_baselines but computed exactly.
+    """
+    if not current_wait_times:
+        return []
+    targets = pd.DataFrame({
+        'attraction_id': [int(row['attraction_id']) for row in current_wait_times],
+        'target_dow': [int(row['day_of_week']) for row in current_wait_times],
+        'target_hour': [int(row['hour_of_day']) for row in current_wait_times],
+        'current_wait': [row['Wait Time (minutes)'] for row in current_wait_times],
+    }).drop_duplicates('attraction_id')
+
+    history = read_history(
+        root,
+        attraction_ids=targets['attraction_id'],
+        since=since,
+        columns=['attraction_id', 'attraction_status_id', 'status', 'stand_by', 'timestamp', 'created_on'],
+    )
+    history = compact(history)
+    history = history[history['status'] == 'Operating']
+
+    # Postgres numbers days of the week from Sunday = 0, pandas from Monday = 0
+    history = history.assign(
+        dow=(history['timestamp'].dt.dayofweek + 1) % 7,
+        hour=history['timestamp'].dt.hour,
+    ).merge(targets, on='attraction_id')
+    matches = history[
+        (history['dow'] == history['target_dow']) &
+        (history['hour'] >= np.maximum(0, history['target_hour'] - 1)) &
+        (history['hour'] <= np.minimum(23, history['target_hour'] + 1))
+    ]
+    waits = matches.groupby('attraction_id')['stand_by']
+    totals = waits.agg(['sum', 'count']).reset_index()
+    totals = totals.merge(targets[['attraction_id', 'current_wait']], on='attraction_id')
+    if quantile is None:
+        avg_wait = totals['sum'] / totals['count']
+    else:
+        avg_wait = totals['attraction_id'].map(waits.quantile(quantile))
+    pct_of_avg = (totals['current_wait'].astype(float) * 100.0 / avg_wait.replace(0, np.nan))
+    return [
+        {
+            'attraction_id': int(attraction_id),
+            'avg_wait': float(avg),
+            'sample_count': int(count),
+            'pct_of_avg': None if pd.isna(pct) else float(pct),
+        }
+        for attraction_id, avg, count, pct in zip(totals['attraction_id'], avg_wait, totals['count'], pct_of_avg)
+    ]
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    if len(sys.argv) < 2 or sys.argv[1] != 'export':
+        print("Usage: python history_store.py export [ROOT]")
+        sys.exit(1)
+    root = sys.argv[2] if len(sys.argv) > 2 else os.getenv('history_store_path', 'history')
+    with db.connection() as conn:
+        started = time.perf_counter()
+        exported = export(conn, root)
+        print(f"Exported {exported} parks.wait rows to {root} in {time.perf_counter() - started:.1f}s")
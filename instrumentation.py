@@ -0,0 +1,96 @@
+"""Per-rerun timing of the app's data access and rendering phases.
+
+A Profiler records wall time, queries, rows and bytes fetched and connection
+wait per named phase, logs the breakdown as one JSON line on the `wilck.perf`
+logger, and can show it in a diagnostics panel. It is enabled for every
+session by setting the `diagnostics` environment variable, or for one
+session with the `?diagnostics=1` query parameter. When disabled, `phase()`
+returns a shared no-op context manager and nothing is recorded.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+import streamlit as st
+
+import db
+
+logger = logging.getLogger('wilck.perf')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_DISABLED = nullcontext()
+
+
+def is_enabled(query_params):
+    return (
+        os.getenv('diagnostics', '').lower() in ('1', 'true', 'yes') or
+        query_params.get('diagnostics') == '1'
+    )
+
+
+class Profiler:
+    def __init__(self, page, enabled):
+        self.page = page
+        self.enabled = enabled
+        self.restart()
+
+    def restart(self):
+        """Start a new breakdown, e.g. for a fragment rerun after the script finished."""
+        self.phases = []
+        self.finished = False
+        self._started = time.perf_counter()
+
+    def phase(self, name):
+        """Context manager timing the block as phase `name`."""
+        if not self.enabled:
+            return _DISABLED
+        return self._record(name)
+
+    @contextmanager
+    def _record(self, name):
+        started = time.perf_counter()
+        with db.track_queries() as stats:
+            try:
+                yield
+            finally:
+                self.phases.append({
+                    'phase': name,
+                    'ms': round((time.perf_counter() - started) * 1000, 2),
+                    'queries': stats.queries,
+                    'rows': stats.rows,
+                    'bytes': stats.bytes,
+                    'db_ms': round(stats.seconds * 1000, 2),
+                    'connections': stats.connections,
+                    'acquire_ms': round(stats.acquire_seconds * 1000, 2),
+                })
+
+    def finish(self):
+        """Close the breakdown and log it. Returns the summary, or None when disabled."""
+        self.finished = True
+        if not self.enabled:
+            return None
+        self.summary = {
+            'event': 'rerun',
+            'page': self.page,
+            'total_ms': round((time.perf_counter() - self._started) * 1000, 2),
+            'phases': self.phases,
+        }
+        logger.info(json.dumps(self.summary))
+        return self.summary
+
+
+def show_panel(profiler):
+    """Render the breakdown of a finished profiler; does nothing when disabled."""
+    if not profiler.enabled:
+        return
+    import pandas as pd
+    with st.expander("Diagnostics", expanded=True):
+        st.caption(f"{profiler.summary['page']}: {profiler.summary['total_ms']:.1f} ms this rerun")
+        st.dataframe(pd.DataFrame(profiler.phases), hide_index=True, use_container_width=True)
@@ -0,0 +1,404 @@
+"""Bulk loader for collector snapshots into parks.wait.
+
+Reads the park snapshot files the collector lambda writes (one JSON document
+per park and collection run, as `.json` or `.json.gz`) from a directory tree
+and turns them into parks.wait rows the same way the parser lambda does,
+creating missing destinations, parks, attractions, types and statuses on the
+way. Instead of one INSERT per row, rows are batched and streamed in with
+COPY, after dropping the consecutive duplicates the compactor lambda would
+otherwise delete later: a row is only loaded when its status or stand_by
+differs from the previous row for the same attraction on the same day.
+Rows already in parks.wait, e.g. from files the parser lambda has processed
+(renamed to `<timestamp>-processed.json`), are never loaded twice, so
+loading a tree that overlaps the database is safe.
+
+Files are loaded in the order of their names, which the collector sets to the
+snapshot time. Each batch commits together with a checkpoint in
+parks.wait_load_state (migrations/004_wait_load_state.sql), so re-running an
+interrupted load picks up after the last committed file.
+
+    python loader.py ./park-data
+
+Rows get the snapshot time as created_on, as if they had been parsed when
+they were collected.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+import db
+
+# Rows copied per transaction and checkpoint
+BATCH_SIZE = 100000
+
+WAIT_COLUMNS = [
+    'attraction_id', 'attraction_status_id', 'timestamp', 'last_updated',
+    'stand_by', 'forecast', 'metadata', 'created_on',
+]
+
+
+def _file_key(path):
+    # The collector names files after the snapshot time, and parks live in
+    # separate folders, so order by file name first
+    return os.path.basename(path), path
+
+
+def snapshot_files(root):
+    """Paths of the snapshot files under `root`, relative to it, in load order."""
+    if os.path.isfile(root):
+        return [os.path.basename(root)]
+    paths = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(('.json', '.json.gz')):
+                paths.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(paths, key=_file_key)
+
+
+def read_snapshot(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _utc(value):
+    """A naive UTC datetime from an ISO 8601 string, as the parser stores them."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class References:
+    """Ids of the destinations, parks, attractions, types and statuses, created on first sight.
+
+    Looked up by the same keys the parser lambda uses: destination name, park
+    and attraction oid, type and status key.
+    """
+
+    def __init__(self, cur):
+        self.cur = cur
+        self.destinations = self._load("SELECT name, id FROM parks.destination")
+        self.parks = self._load("SELECT oid, id FROM parks.park")
+        self.attraction_types = self._load("SELECT key, id FROM parks.attraction_type")
+        self.attractions = self._load("SELECT oid, id FROM parks.attraction")
+        self.statuses = self._load("SELECT key, id FROM parks.attraction_status")
+
+    def _load(self, sql):
+        self.cur.execute(sql)
+        return dict(self.cur.fetchall())
+
+    def _insert(self, cache, key, sql, params):
+        self.cur.execute(sql, params)
+        cache[key] = self.cur.fetchone()[0]
+        return cache[key]
+
+    def destination(self, snapshot):
+        name = snapshot['destination']
+        if name in self.destinations:
+            return self.destinations[name]
+        return self._insert(self.destinations, name, """
+            INSERT INTO parks.destination (oid, name, timezone, location)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+        """, (snapshot['data']['id'], name, snapshot['data'].get('timezone') or 'America/New_York', name))
+
+    def park(self, snapshot):
+        oid = snapshot['data']['id']
+        if oid in self.parks:
+            return self.parks[oid]
+        return self._insert(self.parks, oid, """
+            INSERT INTO parks.park (destination_id, oid, name, location)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+        """, (self.destination(snapshot), oid, snapshot['park'], snapshot['destination']))
+
+    def attraction_type(self, key):
+        if key in self.attraction_types:
+            return self.attraction_types[key]
+        return self._insert(self.attraction_types, key, """
+            INSERT INTO parks.attraction_type (key, type_name)
+            VALUES (%s, %s)
+            RETURNING id
+        """, (key, key.capitalize()))
+
+    def attraction(self, item, park_id):
+        oid = item['id']
+        if oid in self.attractions:
+            return self.attractions[oid]
+        return self._insert(self.attractions, oid, """
+            INSERT INTO parks.attraction (park_id, attraction_type_id, oid, name, lat, long)
+            VALUES (%s, %s, %s, %s, 0.0, 0.0)
+            RETURNING id
+        """, (park_id, self.attraction_type(item['entityType']), oid, item['name']))
+
+    def status(self, key):
+        key = key or 'UNKNOWN'
+        if key in self.statuses:
+            return self.statuses[key]
+        return self._insert(self.statuses, key, """
+            INSERT INTO parks.attraction_status (key, status)
+            VALUES (%s, %s)
+            RETURNING id
+        """, (key, key.capitalize()))
+
+
+def snapshot_rows(references, snapshot, loaded_at=None):
+    """parks.wait rows (in WAIT_COLUMNS order) of one collector snapshot.
+
+    forecast and metadata are left as parsed JSON; copy_waits() serializes
+    them for the rows that survive deduplication only.
+    """
+    timestamp = _utc(snapshot['timestamp'])
+    park_id = references.park(snapshot)
+    loaded_at = loaded_at or datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for item in snapshot['data']['liveData']:
+        if item.get('entityType') == 'PARK':
+            continue
+        standby = (item.get('queue') or {}).get('STANDBY') or {}
+        stand_by = standby.get('waitTime')
+        forecast = item.get('forecast')
+        rows.append((
+            references.attraction(item, park_id),
+            references.status(item.get('status')),
+            timestamp,
+            _utc(item['lastUpdated']) if item.get('lastUpdated') else loaded_at,
+            -1 if stand_by is None else stand_by,
+            forecast if isinstance(forecast, list) and forecast else None,
+            item,
+            timestamp,
+        ))
+    return rows
+
+
+class RunLengthFilter:
+    """Drops rows that repeat the previous row of their attraction, like the compactor.
+
+    Remembers the last row seen per attraction across batches. An attraction
+    seen for the first time is compared with its latest row already in
+    parks.wait at or before the incoming one, so loads continue runs across
+    files, batches and resumed loads. Rows whose attraction and timestamp are
+    already in parks.wait are dropped too, but still count as the previous
+    row, so the rows the compactor deleted around them come out as repeats.
+    """
+
+    def __init__(self):
+        self.last = {}
+
+    def _seed(self, cur, rows):
+        first_seen = {}
+        for row in rows:
+            attraction_id, timestamp = row[0], row[2]
+            if attraction_id not in self.last and attraction_id not in first_seen:
+                first_seen[attraction_id] = timestamp
+        if not first_seen:
+            return
+        # One index lookup per attraction (see migrations/002_wait_indexes.sql)
+        cur.execute("""
+            SELECT t.attraction_id, w.attraction_status_id, w.stand_by, w.timestamp, w.created_on::date
+            FROM unnest(%s::bigint[], %s::timestamp[]) AS t(attraction_id, first_timestamp)
+            CROSS JOIN LATERAL (
+                SELECT attraction_status_id, stand_by, timestamp, created_on
+                FROM parks.wait
+                WHERE attraction_id = t.attraction_id
+                AND timestamp <= t.first_timestamp
+                ORDER BY timestamp DESC
+                LIMIT 1
+            ) w
+        """, (list(first_seen), list(first_seen.values())))
+        for attraction_id, status_id, stand_by, timestamp, created_day in cur.fetchall():
+            self.last[attraction_id] = (status_id, stand_by, timestamp, created_day)
+
+    def _existing(self, cur, rows):
+        """{(attraction_id, timestamp): created_on day} of the rows already in parks.wait."""
+        attraction_ids = sorted({row[0] for row in rows})
+        if not attraction_ids:
+            return {}
+        # Only rows within an attraction's stored time range can be there,
+        # so loads of newer or older history skip the per-row lookup
+        cur.execute("""
+            SELECT t.attraction_id, r.first_timestamp, r.last_timestamp
+            FROM unnest(%s::bigint[]) AS t(attraction_id)
+            CROSS JOIN LATERAL (
+                SELECT MIN(timestamp) AS first_timestamp, MAX(timestamp) AS last_timestamp
+                FROM parks.wait
+                WHERE attraction_id = t.attraction_id
+            ) r
+            WHERE r.first_timestamp IS NOT NULL
+        """, (attraction_ids,))
+        ranges = {attraction_id: (first, last) for attraction_id, first, last in cur.fetchall()}
+        candidates = [
+            (row[0], row[2]) for row in rows
+            if row[0] in ranges and ranges[row[0]][0] <= row[2] <= ranges[row[0]][1]
+        ]
+        if not candidates:
+            return {}
+        cur.execute("""
+            SELECT w.attraction_id, w.timestamp, w.created_on::date
+            FROM unnest(%s::bigint[], %s::timestamp[]) AS t(attraction_id, timestamp)
+            JOIN parks.wait w ON w.attraction_id = t.attraction_id AND w.timestamp = t.timestamp
+        """, ([c[0] for c in candidates], [c[1] for c in candidates]))
+        return {(attraction_id, timestamp): created_day for attraction_id, timestamp, created_day in cur.fetchall()}
+
+    def filter(self, cur, rows):
+        """The rows of a batch worth loading, in timestamp order."""
+        rows = sorted(rows, key=lambda row: row[2])
+        self._seed(cur, rows)
+        existing = self._existing(cur, rows)
+        kept = []
+        for row in rows:
+            attraction_id, status_id, timestamp, _, stand_by, _, _, created_on = row
+            created_day = created_on.date()
+            previous = self.last.get(attraction_id)
+            if (attraction_id, timestamp) in existing:
+                # Already loaded; it is the previous row of what follows
+                if previous is None or timestamp >= previous[2]:
+                    self.last[attraction_id] = (status_id, stand_by, timestamp, existing[attraction_id, timestamp])
+                continue
+            if previous is not None and timestamp < previous[2]:
+                # Older than rows already seen; there is no telling what
+                # precedes it, so keep it
+                kept.append(row)
+                continue
+            self.last[attraction_id] = (status_id, stand_by, timestamp, created_day)
+            if previous is not None and previous[3] == created_day and \
+                    previous[0] == status_id and previous[1] == stand_by:
+                continue
+            kept.append(row)
+        return kept
+
+
+def copy_waits(cur, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        forecast, metadata = row[5], row[6]
+        writer.writerow(row[:5] + (
+            None if forecast is None else json.dumps(forecast, separators=(',', ':')),
+            json.dumps(metadata, separators=(',', ':')),
+        ) + row[7:])
+    buf.seek(0)
+    cur.copy_expert(f"COPY parks.wait ({', '.join(WAIT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _read_state(cur, source):
+    cur.execute("""
+        SELECT last_file, files_loaded, rows_read, rows_loaded
+        FROM parks.wait_load_state
+        WHERE source = %s
+    """, (source,))
+    row = cur.fetchone()
+    if row is None:
+        return {'last_file': None, 'files_loaded': 0, 'rows_read': 0, 'rows_loaded': 0}
+    return dict(zip(['last_file', 'files_loaded', 'rows_read', 'rows_loaded'], row))
+
+
+def _write_state(cur, source, state):
+    cur.execute("""
+        INSERT INTO parks.wait_load_state (source, last_file, files_loaded, rows_read, rows_loaded, loaded_on)
+        VALUES (%(source)s, %(last_file)s, %(files_loaded)s, %(rows_read)s, %(rows_loaded)s, NOW())
+        ON CONFLICT (source) DO UPDATE SET
+            last_file = EXCLUDED.last_file,
+            files_loaded = EXCLUDED.files_loaded,
+            rows_read = EXCLUDED.rows_read,
+            rows_loaded = EXCLUDED.rows_loaded,
+            loaded_on = EXCLUDED.loaded_on
+    """, dict(state, source=source))
+
+
+def load(conn, root, source=None, batch_size=BATCH_SIZE, dry_run=False, report=print):
+    """Load every snapshot file under `root` not loaded yet. Returns this run's totals.
+
+    `source` names the checkpoint (default: the absolute path of `root`).
+    `report` is called with a progress line after each batch. With `dry_run`
+    the batches are not committed but all run in one transaction, which is
+    rolled back at the end, checkpoint included. Later batches still see the
+    ids References created and the rows RunLengthFilter remembers.
+    """
+    source = source or os.path.abspath(root)
+    with conn.cursor() as cur:
+        state = _read_state(cur, source)
+    conn.commit()
+
+    paths = snapshot_files(root)
+    if state['last_file'] is not None:
+        done = _file_key(state['last_file'])
+        paths = [path for path in paths if _file_key(path) > done]
+
+    totals = {'files': 0, 'rows_read': 0, 'rows_loaded': 0, 'seconds': 0.0}
+    run_length = RunLengthFilter()
+    started = time.perf_counter()
+    batch, batch_files = [], []
+
+    def flush():
+        with conn.cursor() as cur:
+            rows = run_length.filter(cur, batch)
+            copy_waits(cur, rows)
+            totals['files'] += len(batch_files)
+            totals['rows_read'] += len(batch)
+            totals['rows_loaded'] += len(rows)
+            state['last_file'] = batch_files[-1]
+            state['files_loaded'] += len(batch_files)
+            state['rows_read'] += len(batch)
+            state['rows_loaded'] += len(rows)
+            _write_state(cur, source, state)
+        if not dry_run:
+            conn.commit()
+        totals['seconds'] = time.perf_counter() - started
+        report(
+            f"{totals['files']}/{len(paths)} files, {totals['rows_read']} rows read, "
+            f"{totals['rows_loaded']} loaded ({_dropped(totals):.0%} duplicates), "
+            f"{totals['rows_read'] / max(totals['seconds'], 1e-9):.0f} rows/s"
+        )
+        batch.clear()
+        batch_files.clear()
+
+    with conn.cursor() as cur:
+        references = References(cur)
+        for path in paths:
+            batch.extend(snapshot_rows(references, read_snapshot(os.path.join(root, path))))
+            batch_files.append(path)
+            if len(batch) >= batch_size:
+                flush()
+        if batch_files:
+            flush()
+    conn.rollback()
+    totals['seconds'] = time.perf_counter() - started
+    return totals
+
+
+def _dropped(totals):
+    return 1 - totals['rows_loaded'] / totals['rows_read'] if totals['rows_read'] else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('root', help="directory of collector snapshot files, or a single file")
+    parser.add_argument('--source', help="checkpoint name (default: the absolute path of ROOT)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument('--dry-run', action='store_true', help="load in one transaction and roll it back at the end")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    with db.connection() as conn:
+        totals = load(conn, args.root, source=args.source, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(
+        f"{'Would load' if args.dry_run else 'Loaded'} {totals['rows_loaded']} of {totals['rows_read']} "
+        f"rows from {totals['files']} files in {totals['seconds']:.1f}s "
+        f"({totals['rows_read'] / max(totals['seconds'], 1e-9):.0f} rows/s, "
+        f"{_dropped(totals):.0%} duplicates dropped)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+-- Rollup of Operating stand_by waits used for the "Avg Wait (Same Time)" baseline.
+--
+-- Buckets are keyed by attraction, day of week and hour like the baseline
+-- lookup, plus the calendar day so the lookback window can slide without
+-- rebuilding the rollup. rollup.py refreshes it incrementally from parks.wait.
+
+CREATE TABLE IF NOT EXISTS parks.wait_baseline (
+  attraction_id BIGINT NOT NULL,
+  day_of_week SMALLINT NOT NULL,
+  hour_of_day SMALLINT NOT NULL,
+  day DATE NOT NULL,
+  stand_by_sum BIGINT NOT NULL,
+  stand_by_count BIGINT NOT NULL,
+  PRIMARY KEY (attraction_id, day_of_week, hour_of_day, day),
+  FOREIGN KEY (attraction_id) REFERENCES parks.attraction(id)
+);
+
+-- Last parks.wait row seen per attraction, so consecutive duplicates can be
+-- skipped across refreshes the same way the compactor lambda removes them.
+CREATE TABLE IF NOT EXISTS parks.wait_baseline_tail (
+  attraction_id BIGINT PRIMARY KEY,
+  attraction_status_id BIGINT NOT NULL,
+  stand_by BIGINT NOT NULL,
+  timestamp TIMESTAMP NOT NULL,
+  created_day DATE,
+  FOREIGN KEY (attraction_id) REFERENCES parks.attraction(id)
+);
+
+-- Single-row high-water mark of the parks.wait ids already rolled up
+CREATE TABLE IF NOT EXISTS parks.wait_baseline_state (
+  id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  last_wait_id BIGINT NOT NULL DEFAULT 0,
+  refreshed_on TIMESTAMP
+);
+
+INSERT INTO parks.wait_baseline_state (id) VALUES (1) ON CONFLICT DO NOTHING;
@@ -0,0 +1,16 @@
+-- Indexes behind the latest-wait lookups in waits.py.
+--
+-- The Wait Times page asks for the newest parks.wait row of each attraction
+-- in a park. With (attraction_id, timestamp DESC) that is one short index
+-- probe per attraction instead of a scan of the park's whole history, and
+-- the snapshot refresh ("rows newer than the snapshot") reads only the index
+-- entries past its timestamp. explain_check.py verifies the plans.
+--
+-- On a large, live parks.wait run these as CREATE INDEX CONCURRENTLY from
+-- psql instead, so the collector's inserts are not blocked while they build.
+
+CREATE INDEX IF NOT EXISTS wait_attraction_id_timestamp_idx
+  ON parks.wait (attraction_id, timestamp DESC);
+
+CREATE INDEX IF NOT EXISTS attraction_park_id_idx
+  ON parks.attraction (park_id);
@@ -0,0 +1,32 @@
+-- Quantile sketches of Operating stand_by waits, for median/p75/p90 baselines.
+--
+-- One serialized t-digest (see sketch.py) per attraction, day of week, hour
+-- and calendar day, the same buckets as parks.wait_baseline. rollup.py
+-- updates both from the same batches of parks.wait rows, and a baseline
+-- lookup merges the digests of its window.
+
+CREATE TABLE IF NOT EXISTS parks.wait_sketch (
+  attraction_id BIGINT NOT NULL,
+  day_of_week SMALLINT NOT NULL,
+  hour_of_day SMALLINT NOT NULL,
+  day DATE NOT NULL,
+  digest BYTEA NOT NULL,
+  PRIMARY KEY (attraction_id, day_of_week, hour_of_day, day),
+  FOREIGN KEY (attraction_id) REFERENCES parks.attraction(id)
+);
+
+-- The sums already rolled up are kept. The digests of the waits they cover
+-- are built by `python rollup.py` (backfill_sketches), which reads the mark
+-- below, one attraction per transaction, so page views never wait on it.
+ALTER TABLE parks.wait_baseline_state
+  ADD COLUMN IF NOT EXISTS sketch_backfill_wait_id BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS sketch_backfill_attraction_id BIGINT NOT NULL DEFAULT 0;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM parks.wait_sketch) THEN
+    UPDATE parks.wait_baseline_state
+    SET sketch_backfill_wait_id = last_wait_id, sketch_backfill_attraction_id = 0
+    WHERE id = 1;
+  END IF;
+END $$;
@@ -0,0 +1,14 @@
+-- Checkpoints of loader.py, the bulk history loader.
+--
+-- One row per input source, holding the last input file loaded from it.
+-- The loader updates it in the same transaction as the parks.wait rows it
+-- copies, so an interrupted load resumes right after the last committed file.
+
+CREATE TABLE IF NOT EXISTS parks.wait_load_state (
+  source TEXT PRIMARY KEY,
+  last_file TEXT NOT NULL,
+  files_loaded BIGINT NOT NULL DEFAULT 0,
+  rows_read BIGINT NOT NULL DEFAULT 0,
+  rows_loaded BIGINT NOT NULL DEFAULT 0,
+  loaded_on TIMESTAMP
+);
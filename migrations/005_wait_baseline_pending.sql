@@ -0,0 +1,11 @@
+-- Where the rollup may advance its high-water mark to next.
+--
+-- Transactions that insert into parks.wait can commit out of id order, so a
+-- refresh only records the highest id it sees as pending, together with the
+-- end of its snapshot. A later refresh advances last_wait_id to it once every
+-- transaction that was running then has finished (see rollup.py).
+
+ALTER TABLE parks.wait_baseline_state
+  ADD COLUMN IF NOT EXISTS pending_wait_id BIGINT,
+  ADD COLUMN IF NOT EXISTS pending_xmax XID8,
+  ADD COLUMN IF NOT EXISTS pending_on TIMESTAMP;
@@ -0,0 +1,286 @@
+"""Ride order planning from hourly historical wait profiles.
+
+`get_hourly_profiles()` loads the average Operating wait of a set of rides
+for every hour of a given day of week from the parks.wait_baseline rollup,
+as an (rides x 24) NumPy matrix shared by every session in the process.
+The rollup buckets waits by UTC day and hour, like parks.wait timestamps;
+profiles are re-bucketed to the park's local time, so plans, start and close
+times are all in park time.
+`plan()` spreads that matrix over the slots between a start time and park
+close and searches for the ride order that fits the most rides before close
+with the least expected waiting: exactly, by dynamic programming over subsets
+of rides, for up to DP_MAX_RIDES rides, and by a beam search over the same
+states beyond that. Planning from a cached profile takes milliseconds,
+so the Wait Times page re-plans on every rerun, e.g. after a ride goes down.
+"""
+import heapq
+import math
+import os
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import db
+import rollup
+from cache import TTLCache
+
+# Length of the time slots the hourly profiles are interpolated to
+SLOT_MINUTES = 15
+
+# Minutes between boarding one ride and joining the next queue: the ride
+# itself plus walking
+RIDE_MINUTES = 10
+
+# Largest selection planned exactly; the search is O(2^n * n)
+DP_MAX_RIDES = 12
+
+# Sets of rides kept per search step for larger selections
+BEAM_WIDTH = 128
+
+profile_cache = TTLCache(
+    ttl=float(os.getenv('planner_profile_ttl', '3600')),
+    maxsize=int(os.getenv('planner_profile_cache_size', '256')),
+)
+
+
+def local_now(tz):
+    """The current wall-clock time in time zone `tz`, as a naive datetime."""
+    return datetime.now(ZoneInfo(tz)).replace(tzinfo=None)
+
+
+def local_hourly_profiles(rows, attraction_ids, day_of_week, tz):
+    """Average wait per attraction and `tz` local hour on the local `day_of_week`.
+
+    `rows` are (attraction_id, day, hour_of_day, stand_by_sum, stand_by_count)
+    parks.wait_baseline buckets, whose day and hour are UTC. Each is moved to
+    the local hour it falls in, with the UTC offset of its own date, so
+    daylight saving changes within the window are accounted for.
+    `day_of_week` is numbered like Postgres, Sunday = 0. Returns an array of
+    shape (len(attraction_ids), 24), NaN where there is no history.
+    """
+    zone = ZoneInfo(tz)
+    index = {attraction_id: i for i, attraction_id in enumerate(attraction_ids)}
+    sums = np.zeros((len(attraction_ids), 24))
+    counts = np.zeros((len(attraction_ids), 24))
+    local_hours = {}
+    for attraction_id, day, hour_of_day, stand_by_sum, stand_by_count in rows:
+        key = (day, hour_of_day)
+        if key not in local_hours:
+            local = datetime.combine(day, time(hour_of_day), timezone.utc).astimezone(zone)
+            local_hours[key] = ((local.weekday() + 1) % 7, local.hour)
+        local_day_of_week, local_hour = local_hours[key]
+        if local_day_of_week == day_of_week:
+            sums[index[attraction_id], local_hour] += stand_by_sum
+            counts[index[attraction_id], local_hour] += stand_by_count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def fetch_hourly_profiles(conn, attraction_ids, day_of_week, since, tz='UTC'):
+    """Average Operating wait per attraction and `tz` local hour on `day_of_week` since `since`.
+
+    Returns an array of shape (len(attraction_ids), 24), NaN where there is
+    no history.
+    """
+    # A local day overlaps the UTC day of week before and after it at most
+    days_of_week = [(day_of_week + shift) % 7 for shift in (-1, 0, 1)]
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT attraction_id, day, hour_of_day, stand_by_sum, stand_by_count
+            FROM parks.wait_baseline
+            WHERE attraction_id = ANY(%s)
+            AND day_of_week = ANY(%s)
+            AND day >= %s
+        """, (list(attraction_ids), days_of_week, since - timedelta(days=1)))
+        rows = cur.fetchall()
+    conn.rollback()
+    return local_hourly_profiles(rows, attraction_ids, day_of_week, tz)
+
+
+def get_hourly_profiles(attraction_ids, day_of_week, since, tz='UTC'):
+    """Cached `fetch_hourly_profiles()` for a ride selection.
+
+    Returns (attraction_ids, hourly) with the ids sorted, so one entry serves
+    every session with the same selection. `since` is used as a date. The
+    rollup is topped up first if this process hasn't refreshed it lately.
+    """
+    attraction_ids = tuple(sorted({int(attraction_id) for attraction_id in attraction_ids}))
+    since = since.date() if hasattr(since, 'date') else since
+
+    def load():
+        with db.connection() as conn:
+            rollup.refresh_if_stale(conn)
+            return attraction_ids, fetch_hourly_profiles(conn, attraction_ids, day_of_week, since, tz)
+
+    return profile_cache.get_or_load(('hourly_profiles', attraction_ids, day_of_week, since, tz), load)
+
+
+def slot_waits(hourly, start, slots, slot_minutes=SLOT_MINUTES):
+    """Expected wait of each ride at the start of each slot from `start` on.
+
+    `start` is in the same local time as the hours of `hourly`. Hourly averages are taken to hold at the middle of their hour and
+    interpolated linearly in between. Rides without any history get the mean
+    of the others, walk-on (-1) averages count as no wait.
+    """
+    hours = (start.hour + start.minute / 60 + np.arange(slots) * slot_minutes / 60) % 24
+    centers = np.arange(24) + 0.5
+    waits = np.full((len(hourly), slots), np.nan)
+    for i, profile in enumerate(hourly):
+        known = ~np.isnan(profile)
+        if known.any():
+            waits[i] = np.interp(hours, centers[known], profile[known])
+    if np.isnan(waits).all():
+        return np.zeros_like(waits)
+    fill = np.nanmean(waits, axis=0)
+    waits = np.where(np.isnan(waits), np.where(np.isnan(fill), np.nanmean(waits), fill), waits)
+    return np.maximum(waits, 0)
+
+
+class _Timetable:
+    """When a ride can be boarded given the time its queue is reached.
+
+    Times are minutes after the plan's start. Joining a queue is possible
+    until the last slot ends. Since showing up later can mean boarding
+    sooner when a queue is about to shrink, boarding uses the best of
+    joining now and holding off until a later slot.
+    """
+
+    def __init__(self, waits, slot_minutes, ride_minutes):
+        self.waits = waits
+        self.slot_minutes = slot_minutes
+        self.ride_minutes = ride_minutes
+        self.slots = waits.shape[1]
+        board_at_slot = np.arange(self.slots) * slot_minutes + waits
+        best_from = np.minimum.accumulate(board_at_slot[:, ::-1], axis=1)[:, ::-1]
+        # Earliest boarding when holding off until a later slot than the current one
+        self.best_later = np.concatenate([best_from[:, 1:], np.full((len(waits), 1), np.inf)], axis=1)
+
+    def board(self, t, rides=slice(None)):
+        slot = int(t // self.slot_minutes)
+        if slot >= self.slots:
+            return np.full(self.waits[rides, 0].shape, np.inf)
+        return np.minimum(t + self.waits[rides, slot], self.best_later[rides, slot])
+
+    def run(self, order):
+        """Walk through `order`; returns ([(ride, arrive, wait)], [rides that don't fit])."""
+        t = 0.0
+        stops, unfit = [], []
+        for ride in order:
+            board = self.board(t, ride)
+            if math.isinf(board):
+                unfit.append(ride)
+                continue
+            stops.append((ride, t, board - t))
+            t = board + self.ride_minutes
+        return stops, unfit
+
+
+def _score(stops):
+    return (-len(stops), sum(wait for _, _, wait in stops))
+
+
+def _exact_order(timetable, rides):
+    """Dynamic programming over subsets: earliest time each set of rides can be done by."""
+    bits = 1 << np.arange(rides)
+    done_by = np.full(1 << rides, np.inf)
+    last = np.full(1 << rides, -1)
+    done_by[0] = 0.0
+    for mask in range(1 << rides):
+        t = done_by[mask]
+        if math.isinf(t):
+            continue
+        free = np.flatnonzero((mask & bits) == 0)
+        if not len(free):
+            continue
+        finish = timetable.board(t, free) + timetable.ride_minutes
+        following = mask | bits[free]
+        better = finish < done_by[following]
+        done_by[following[better]] = finish[better]
+        last[following[better]] = free[better]
+
+    # Most rides first, then the earliest finish, i.e. the least waiting
+    reachable = np.flatnonzero(~np.isinf(done_by))
+    counts = np.array([bin(mask).count('1') for mask in reachable])
+    candidates = reachable[counts == counts.max()]
+    mask = int(candidates[np.argmin(done_by[candidates])])
+    order = []
+    while mask:
+        ride = int(last[mask])
+        order.append(ride)
+        mask ^= 1 << ride
+    order.reverse()
+    return order + [ride for ride in range(rides) if ride not in order]
+
+
+def _beam_order(timetable, rides, width=BEAM_WIDTH):
+    """The same search as _exact_order, keeping only the `width` sets done earliest per size."""
+    layer = {0: (0.0, [])}
+    order = []
+    while layer:
+        following = {}
+        for mask, (t, done) in layer.items():
+            free = [ride for ride in range(rides) if not mask >> ride & 1]
+            if not free:
+                continue
+            finish = timetable.board(t, free) + timetable.ride_minutes
+            for ride, f in zip(free, finish):
+                key = mask | 1 << ride
+                if not math.isinf(f) and (key not in following or f < following[key][0]):
+                    following[key] = (f, done + [ride])
+        layer = dict(heapq.nsmallest(width, following.items(), key=lambda item: item[1][0]))
+        if layer:
+            # Every set in a layer has one more ride, so the latest layer's best wins
+            order = min(layer.values(), key=lambda value: value[0])[1]
+    return order + [ride for ride in range(rides) if ride not in order]
+
+
+def plan(attraction_ids, hourly, start, close, current_waits=None, skip=(),
+         ride_minutes=RIDE_MINUTES, slot_minutes=SLOT_MINUTES):
+    """Order the rides to fit the most of them before `close` with the least waiting.
+
+    `attraction_ids` and `hourly` are as returned by get_hourly_profiles(),
+    and `start`, `close` and the returned times are in the same local time.
+    `current_waits` maps attraction ids to their current wait, which replaces
+    the expected wait for the first slot; rides in `skip` (e.g. ones that are
+    down) are left out. Returns a dict with:
+
+    - "stops": the rides in visiting order, each a dict with attraction_id,
+      "arrive" (when to join the queue) and "expected_wait" in minutes
+    - "unplanned": attraction ids skipped or that don't fit before close
+    - "total_wait": the expected minutes spent waiting
+    - "method": "exact" or "heuristic"
+    """
+    skip = set(skip)
+    rows = [i for i, attraction_id in enumerate(attraction_ids) if attraction_id not in skip]
+    ids = [attraction_ids[i] for i in rows]
+    slots = max(0, math.ceil((close - start).total_seconds() / 60 / slot_minutes))
+    if not ids or not slots:
+        return {'stops': [], 'unplanned': list(attraction_ids), 'total_wait': 0.0, 'method': 'exact'}
+
+    waits = slot_waits(hourly[rows], start, slots, slot_minutes)
+    for i, attraction_id in enumerate(ids):
+        wait = (current_waits or {}).get(attraction_id)
+        if wait is not None and not np.isnan(wait):
+            waits[i, 0] = max(wait, 0)
+    timetable = _Timetable(waits, slot_minutes, ride_minutes)
+
+    if len(ids) <= DP_MAX_RIDES:
+        method, order = 'exact', _exact_order(timetable, len(ids))
+    else:
+        method, order = 'heuristic', _beam_order(timetable, len(ids))
+    stops, unfit = timetable.run(order)
+    return {
+        'stops': [
+            {
+                'attraction_id': ids[ride],
+                'arrive': start + timedelta(minutes=arrive),
+                'expected_wait': wait,
+            }
+            for ride, arrive, wait in stops
+        ],
+        'unplanned': [attraction_id for attraction_id in attraction_ids if attraction_id in skip] +
+                     [ids[ride] for ride in unfit],
+        'total_wait': float(sum(wait for _, _, wait in stops)),
+        'method': method,
+    }
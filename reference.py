@@ -0,0 +1,100 @@
+"""Parks, attraction types and per-park ride lists.
+
+This data changes about once a day, so it is cached for every session in the
+process for `reference_cache_ttl` seconds (one hour by default). Parks and
+attractions added by other processes, such as loader.py or the parser
+lambda, show up once it expires.
+"""
+import os
+
+from psycopg2.extras import RealDictCursor
+
+import db
+from cache import TTLCache
+
+reference_cache = TTLCache(ttl=float(os.getenv('reference_cache_ttl', '3600')))
+
+
+def _fetch_all(query, params=None):
+    with db.connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def get_parks():
+    return reference_cache.get_or_load('parks', lambda: _fetch_all(
+        "SELECT * FROM parks.park ORDER BY name"
+    ))
+
+
+def get_destinations():
+    """Destinations that have at least one park, ordered by name."""
+    return reference_cache.get_or_load('destinations', lambda: _fetch_all("""
+        SELECT d.*
+        FROM parks.destination d
+        WHERE EXISTS (SELECT 1 FROM parks.park p WHERE p.destination_id = d.id)
+        ORDER BY d.name
+    """))
+
+
+def get_excluded_type_ids():
+    """Attraction type ids for restaurants and shows."""
+    return reference_cache.get_or_load('excluded_type_ids', lambda: [
+        row['id'] for row in _fetch_all("""
+            SELECT id FROM parks.attraction_type
+            WHERE type_name IN ('Restaurant', 'Show')
+        """)
+    ])
+
+
+def get_park_attractions(park_name):
+    """Rides (attraction type 2) in the named park, ordered by name."""
+    return reference_cache.get_or_load(('park_attractions', park_name), lambda: _fetch_all("""
+        SELECT a.id, a.name
+        FROM parks.attraction a
+        JOIN parks.park p ON a.park_id = p.id
+        WHERE p.name = %s
+        AND a.attraction_type_id = 2
+        ORDER BY a.name
+    """, (park_name,)))
+
+
+def get_destination_rides(destination_id):
+    """Rides (attraction type 2) in every park of a destination, with their park's id and name."""
+    return reference_cache.get_or_load(('destination_rides', destination_id), lambda: _fetch_all("""
+        SELECT a.id, a.name, a.park_id, p.name as park_name
+        FROM parks.attraction a
+        JOIN parks.park p ON a.park_id = p.id
+        WHERE p.destination_id = %s
+        AND a.attraction_type_id = 2
+        ORDER BY p.name, a.name
+    """, (destination_id,)))
+
+
+def get_attraction_park_ids():
+    """Map of every attraction id to the id of the park it belongs to."""
+    return reference_cache.get_or_load('attraction_park_ids', lambda: {
+        row['id']: row['park_id'] for row in _fetch_all("SELECT id, park_id FROM parks.attraction")
+    })
+
+
+def get_park_timezones():
+    """Map of every park id to its destination's time zone name, e.g. 'America/Los_Angeles'."""
+    return reference_cache.get_or_load('park_timezones', lambda: {
+        row['id']: row['timezone'] for row in _fetch_all("""
+            SELECT p.id, d.timezone
+            FROM parks.park p
+            JOIN parks.destination d ON p.destination_id = d.id
+        """)
+    })
+
+
+def invalidate():
+    """Drop this process's cached reference data; other processes keep theirs."""
+    reference_cache.invalidate()
+
+
+def cache_stats():
+    """Hit/miss counters of the shared reference data cache."""
+    return reference_cache.stats()
@@ -0,0 +1,353 @@
+"""Incremental refresh of the parks.wait_baseline rollup.
+
+The rollup (see migrations/001_wait_baseline_rollup.sql) holds stand_by sums
+and counts of Operating rows per attraction, day of week, hour and calendar
+day, and parks.wait_sketch (migrations/003_wait_sketch.sql) a quantile sketch
+of the same rows per bucket. Each refresh only reads the parks.wait rows added
+since the previous one, tracked by a high-water mark on parks.wait.id.
+
+Inserts into parks.wait can commit out of id order (the parser lambda loads
+every park in its own transaction, all at the same moment), so the mark only
+moves up to an id once no transaction that could still hold a lower one is
+running: a refresh records the highest id it sees as pending, and a later one
+advances to it when every transaction in progress at the time has finished
+and `baseline_rollup_settle_seconds` (default 60) have passed.
+
+Run `python rollup.py` from cron, or let the app refresh it lazily once it is
+older than `baseline_rollup_max_age` seconds. A lazy refresh rolls up at most
+LAZY_BATCH_SIZE ids, so a page view never waits on a large backlog; first
+builds and the sketch backfill after migrations/003 are left to the CLI.
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+import db
+
+# parks.wait ids rolled up per transaction, so a first build over months of
+# history commits progress as it goes
+BATCH_SIZE = 200000
+
+# parks.wait ids a refresh started by the app rolls up at most
+LAZY_BATCH_SIZE = 20000
+
+_last_check = None
+_check_lock = threading.Lock()
+
+
+def settle_seconds():
+    return float(os.getenv('baseline_rollup_settle_seconds', '60'))
+
+
+def wait_id_horizon(cur):
+    """(highest visible parks.wait id, end of this snapshot as xid8 text, NOW())."""
+    cur.execute("""
+        SELECT COALESCE(MAX(id), 0), pg_snapshot_xmax(pg_current_snapshot())::text, NOW()::timestamp
+        FROM parks.wait
+    """)
+    return cur.fetchone()
+
+
+def horizon_settled(cur, xmax, recorded_on, settle):
+    """Whether the transactions running when a horizon was recorded have all finished.
+
+    The time margin covers inserts that had drawn their ids but not yet been
+    assigned a transaction id when the snapshot was taken.
+    """
+    cur.execute("""
+        SELECT
+            pg_snapshot_xmin(pg_current_snapshot()) >= %s::xid8 AND
+            NOW() >= %s::timestamp + make_interval(secs => %s)
+    """, (xmax, recorded_on, settle))
+    return cur.fetchone()[0]
+
+
+def _update_sketches(cur):
+    """Add the batch's waits to the parks.wait_sketch digests of their buckets."""
+    # Imported here so the app can import this module without loading NumPy
+    from sketch import TDigest
+    cur.execute("""
+        SELECT b.attraction_id, b.day_of_week, b.hour_of_day, b.day, array_agg(b.stand_by), s.digest
+        FROM rollup_batch b
+        LEFT JOIN parks.wait_sketch s USING (attraction_id, day_of_week, hour_of_day, day)
+        GROUP BY b.attraction_id, b.day_of_week, b.hour_of_day, b.day, s.digest
+    """)
+    rows = [
+        (attraction_id, day_of_week, hour_of_day, day,
+         (TDigest.from_bytes(digest) if digest is not None else TDigest()).add(values).to_bytes())
+        for attraction_id, day_of_week, hour_of_day, day, values, digest in cur.fetchall()
+    ]
+    execute_values(cur, """
+        INSERT INTO parks.wait_sketch (attraction_id, day_of_week, hour_of_day, day, digest)
+        VALUES %s
+        ON CONFLICT (attraction_id, day_of_week, hour_of_day, day) DO UPDATE SET
+            digest = EXCLUDED.digest
+    """, rows, page_size=1000)
+
+
+def refresh(conn, batch_size=BATCH_SIZE, settle=None, max_batches=None):
+    """Roll up the parks.wait rows added since the last refresh that have settled.
+
+    Rows count once the transactions that might still commit lower ids have
+    finished and `settle` seconds (default `settle_seconds()`) have passed
+    since their ids were seen; until then they wait for a later refresh.
+    With `max_batches` set, stops after that many batches of `batch_size`.
+    Returns how many parks.wait ids were consumed, or None when another
+    process is already refreshing.
+    """
+    if settle is None:
+        settle = settle_seconds()
+    consumed = 0
+    batches = 0
+    while True:
+        if max_batches is not None and batches >= max_batches:
+            return consumed
+        with conn.cursor() as cur:
+            # SKIP LOCKED makes concurrent refreshers back off instead of
+            # queueing up behind each other
+            cur.execute("""
+                SELECT last_wait_id, pending_wait_id, pending_xmax::text, pending_on
+                FROM parks.wait_baseline_state
+                WHERE id = 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            state = cur.fetchone()
+            if state is None:
+                conn.rollback()
+                return None if consumed == 0 else consumed
+            last_wait_id, pending_wait_id, pending_xmax, pending_on = state
+
+            settled = pending_wait_id is not None and horizon_settled(cur, pending_xmax, pending_on, settle)
+            if not settled or pending_wait_id <= last_wait_id:
+                if pending_wait_id is None or (settled and pending_wait_id <= last_wait_id):
+                    # Nothing pending, or all of it rolled up: start waiting
+                    # for the rows visible now
+                    max_wait_id, xmax, now = wait_id_horizon(cur)
+                    if max_wait_id > last_wait_id:
+                        cur.execute("""
+                            UPDATE parks.wait_baseline_state
+                            SET pending_wait_id = %s, pending_xmax = %s::xid8, pending_on = %s
+                            WHERE id = 1
+                        """, (max_wait_id, xmax, now))
+                        conn.commit()
+                        # Settles straight away when nothing else is writing
+                        # and no margin is asked for
+                        if settle <= 0:
+                            continue
+                        return consumed
+                cur.execute("UPDATE parks.wait_baseline_state SET refreshed_on = NOW() WHERE id = 1")
+                conn.commit()
+                return consumed
+            high_wait_id = min(pending_wait_id, last_wait_id + batch_size)
+
+            params = {'last_wait_id': last_wait_id, 'high_wait_id': high_wait_id}
+
+            # A row only counts when its status or stand_by differs from the
+            # previous row for that attraction on the same created_on day,
+            # matching what the compactor lambda keeps
+            cur.execute("""
+                CREATE TEMP TABLE rollup_batch ON COMMIT DROP AS
+                WITH batch AS (
+                    SELECT
+                        w.attraction_id, w.attraction_status_id, w.stand_by,
+                        w.timestamp, w.created_on::date AS created_day, 1 AS is_new
+                    FROM parks.wait w
+                    WHERE w.id > %(last_wait_id)s AND w.id <= %(high_wait_id)s
+                    UNION ALL
+                    SELECT
+                        t.attraction_id, t.attraction_status_id, t.stand_by,
+                        t.timestamp, t.created_day, 0 AS is_new
+                    FROM parks.wait_baseline_tail t
+                ),
+                runs AS (
+                    SELECT
+                        b.*,
+                        LAG(b.attraction_status_id) OVER win AS prev_status_id,
+                        LAG(b.stand_by) OVER win AS prev_stand_by
+                    FROM batch b
+                    WINDOW win AS (
+                        PARTITION BY b.attraction_id, b.created_day
+                        ORDER BY b.timestamp, b.is_new
+                    )
+                )
+                SELECT
+                    r.attraction_id,
+                    EXTRACT(DOW FROM r.timestamp)::smallint AS day_of_week,
+                    EXTRACT(HOUR FROM r.timestamp)::smallint AS hour_of_day,
+                    r.timestamp::date AS day,
+                    r.stand_by
+                FROM runs r
+                JOIN parks.attraction_status s ON r.attraction_status_id = s.id
+                WHERE
+                    r.is_new = 1 AND
+                    s.status = 'Operating' AND
+                    (r.prev_status_id IS NULL OR
+                     r.prev_status_id <> r.attraction_status_id OR
+                     r.prev_stand_by <> r.stand_by)
+            """, params)
+
+            cur.execute("""
+                INSERT INTO parks.wait_baseline
+                    (attraction_id, day_of_week, hour_of_day, day, stand_by_sum, stand_by_count)
+                SELECT attraction_id, day_of_week, hour_of_day, day, SUM(stand_by), COUNT(*)
+                FROM rollup_batch
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (attraction_id, day_of_week, hour_of_day, day) DO UPDATE SET
+                    stand_by_sum = parks.wait_baseline.stand_by_sum + EXCLUDED.stand_by_sum,
+                    stand_by_count = parks.wait_baseline.stand_by_count + EXCLUDED.stand_by_count
+            """)
+            _update_sketches(cur)
+
+            cur.execute("""
+                INSERT INTO parks.wait_baseline_tail
+                    (attraction_id, attraction_status_id, stand_by, timestamp, created_day)
+                SELECT DISTINCT ON (w.attraction_id)
+                    w.attraction_id, w.attraction_status_id, w.stand_by,
+                    w.timestamp, w.created_on::date
+                FROM parks.wait w
+                WHERE w.id > %(last_wait_id)s AND w.id <= %(high_wait_id)s
+                ORDER BY w.attraction_id, w.timestamp DESC
+                ON CONFLICT (attraction_id) DO UPDATE SET
+                    attraction_status_id = EXCLUDED.attraction_status_id,
+                    stand_by = EXCLUDED.stand_by,
+                    timestamp = EXCLUDED.timestamp,
+                    created_day = EXCLUDED.created_day
+                WHERE EXCLUDED.timestamp >= parks.wait_baseline_tail.timestamp
+            """, params)
+
+            cur.execute("""
+                UPDATE parks.wait_baseline_state
+                SET last_wait_id = %(high_wait_id)s, refreshed_on = NOW()
+                WHERE id = 1
+            """, params)
+        conn.commit()
+        consumed += high_wait_id - last_wait_id
+        batches += 1
+
+
+def refresh_if_stale(conn, max_age=None):
+    """Refresh the rollup when this process hasn't done so for `max_age` seconds.
+
+    `max_age` defaults to the `baseline_rollup_max_age` environment variable
+    (300 seconds). Most reruns return without touching the database, and
+    the rest roll up at most one batch of LAZY_BATCH_SIZE ids.
+    """
+    global _last_check
+    if max_age is None:
+        max_age = float(os.getenv('baseline_rollup_max_age', '300'))
+    now = time.monotonic()
+    with _check_lock:
+        if _last_check is not None and now - _last_check < max_age:
+            return None
+        _last_check = now
+    return refresh(conn, batch_size=LAZY_BATCH_SIZE, max_batches=1)
+
+
+def backfill_sketches(conn):
+    """Build the parks.wait_sketch digests of rows rolled up before they existed.
+
+    migrations/003_wait_sketch.sql records the rollup's high-water mark at
+    the time in sketch_backfill_wait_id. The sums are left alone, and this
+    adds the Operating waits up to that id to the sketches one attraction
+    per transaction, merged with what later refreshes have added. Progress
+    is kept in sketch_backfill_attraction_id, so an interrupted backfill
+    picks up where it stopped. Returns the number of waits added.
+    """
+    from sketch import TDigest
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT sketch_backfill_wait_id, sketch_backfill_attraction_id
+            FROM parks.wait_baseline_state
+            WHERE id = 1
+        """)
+        backfill_wait_id, done_attraction_id = cur.fetchone()
+        cur.execute("SELECT id FROM parks.attraction WHERE id > %s ORDER BY id", (done_attraction_id,))
+        attraction_ids = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    if not backfill_wait_id:
+        return 0
+
+    added = 0
+    for attraction_id in attraction_ids:
+        with conn.cursor() as cur:
+            # The same runs rule as refresh(), over this attraction's rows
+            cur.execute("""
+                SELECT
+                    EXTRACT(DOW FROM r.timestamp)::smallint,
+                    EXTRACT(HOUR FROM r.timestamp)::smallint,
+                    r.timestamp::date,
+                    r.stand_by
+                FROM (
+                    SELECT
+                        w.attraction_status_id, w.stand_by, w.timestamp,
+                        LAG(w.attraction_status_id) OVER win AS prev_status_id,
+                        LAG(w.stand_by) OVER win AS prev_stand_by
+                    FROM parks.wait w
+                    WHERE w.attraction_id = %(attraction_id)s AND w.id <= %(backfill_wait_id)s
+                    WINDOW win AS (PARTITION BY w.created_on::date ORDER BY w.timestamp)
+                ) r
+                JOIN parks.attraction_status s ON r.attraction_status_id = s.id
+                WHERE
+                    s.status = 'Operating' AND
+                    (r.prev_status_id IS NULL OR
+                     r.prev_status_id <> r.attraction_status_id OR
+                     r.prev_stand_by <> r.stand_by)
+            """, {'attraction_id': attraction_id, 'backfill_wait_id': backfill_wait_id})
+            buckets = {}
+            for day_of_week, hour_of_day, day, stand_by in cur.fetchall():
+                buckets.setdefault((day_of_week, hour_of_day, day), []).append(stand_by)
+            added += sum(map(len, buckets.values()))
+
+            cur.execute("""
+                SELECT day_of_week, hour_of_day, day, digest
+                FROM parks.wait_sketch
+                WHERE attraction_id = %s
+                FOR UPDATE
+            """, (attraction_id,))
+            existing = {(dow, hour, day): digest for dow, hour, day, digest in cur.fetchall()}
+            rows = []
+            for (day_of_week, hour_of_day, day), values in buckets.items():
+                digest = TDigest().add(values)
+                if (day_of_week, hour_of_day, day) in existing:
+                    digest.merge(TDigest.from_bytes(bytes(existing[day_of_week, hour_of_day, day])))
+                rows.append((attraction_id, day_of_week, hour_of_day, day, digest.to_bytes()))
+            execute_values(cur, """
+                INSERT INTO parks.wait_sketch (attraction_id, day_of_week, hour_of_day, day, digest)
+                VALUES %s
+                ON CONFLICT (attraction_id, day_of_week, hour_of_day, day) DO UPDATE SET
+                    digest = EXCLUDED.digest
+            """, rows, page_size=1000)
+            cur.execute("""
+                UPDATE parks.wait_baseline_state
+                SET sketch_backfill_attraction_id = %s
+                WHERE id = 1
+            """, (attraction_id,))
+        conn.commit()
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE parks.wait_baseline_state
+            SET sketch_backfill_wait_id = 0, sketch_backfill_attraction_id = 0
+            WHERE id = 1
+        """)
+    conn.commit()
+    return added
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    with db.connection() as conn:
+        started = time.perf_counter()
+        consumed = refresh(conn)
+        if consumed is None:
+            print("Another refresh is already running")
+        else:
+            print(f"Rolled up {consumed} parks.wait ids in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        added = backfill_sketches(conn)
+        if added:
+            print(f"Backfilled sketches with {added} waits in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,139 @@
+"""Mergeable quantile sketches of wait times.
+
+A TDigest summarises any number of values in at most about
+`compression / 2` weighted centroids, kept small in the middle of the
+distribution and down to single values in the tails. Quantiles estimated from
+it are accurate to a small fraction of a percentile in the middle and nearly
+exact at the extremes. Digests can be added to one value at a time, merged
+with each other and stored as bytes, which is how rollup.py keeps one per
+attraction, day of week, hour and day in parks.wait_sketch. Baselines merge
+the digests of the window being looked at.
+"""
+import struct
+
+import numpy as np
+
+# Larger keeps more centroids and estimates more accurately
+COMPRESSION = 100
+
+# Values buffered before they are folded into the centroids
+BUFFER_SIZE = 500
+
+_HEADER = struct.Struct('<4sdddI')
+_MAGIC = b'TDG1'
+
+
+class TDigest:
+    """t-digest (Dunning & Ertl) with the arcsine scale function, merged column-wise with NumPy."""
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+        self._buffered = []
+        self._buffered_size = 0
+
+    @property
+    def count(self):
+        self._flush()
+        return float(self.weights.sum())
+
+    def add(self, values, weights=None):
+        """Add one value or an array of them, optionally weighted. Returns self."""
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        if not len(values):
+            return self
+        if weights is None:
+            weights = np.ones(len(values))
+        else:
+            weights = np.broadcast_to(np.asarray(weights, dtype=float), values.shape)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._buffered.append((values, weights))
+        self._buffered_size += len(values)
+        if self._buffered_size >= BUFFER_SIZE:
+            self._flush()
+        return self
+
+    def merge(self, other):
+        """Fold another digest into this one. Returns self."""
+        other._flush()
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._buffered.append((other.means, other.weights))
+            self._buffered_size += len(other.means)
+            self._flush()
+        return self
+
+    @classmethod
+    def merged(cls, digests, compression=COMPRESSION):
+        """A new digest combining all of `digests`."""
+        result = cls(compression)
+        for digest in digests:
+            digest._flush()
+            if len(digest.means):
+                result.min = min(result.min, digest.min)
+                result.max = max(result.max, digest.max)
+                result._buffered.append((digest.means, digest.weights))
+        result._flush()
+        return result
+
+    def quantile(self, q):
+        """Estimated value at quantile `q` (scalar or array, 0 to 1); NaN when empty."""
+        self._flush()
+        if not len(self.means):
+            return np.full(np.shape(q), np.nan)[()]
+        cumulative = np.cumsum(self.weights)
+        total = cumulative[-1]
+        # Each centroid's mean sits at the middle of the rank range it covers
+        centers = cumulative - self.weights / 2
+        positions = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.clip(q, 0, 1) * total, positions, values)[()]
+
+    def to_bytes(self):
+        self._flush()
+        header = _HEADER.pack(_MAGIC, self.compression, self.min, self.max, len(self.means))
+        return header + self.means.astype('<f8').tobytes() + self.weights.astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, compression, min_value, max_value, size = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized TDigest")
+        digest = cls(compression)
+        body = np.frombuffer(data, dtype='<f8', offset=_HEADER.size)
+        digest.means = body[:size].astype(float)
+        digest.weights = body[size:2 * size].astype(float)
+        digest.min, digest.max = min_value, max_value
+        return digest
+
+    def _scale(self, q):
+        return self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        means = np.concatenate([self.means] + [values for values, _ in self._buffered])
+        weights = np.concatenate([self.weights] + [w for _, w in self._buffered])
+        self._buffered = []
+        self._buffered_size = 0
+
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if total <= self.compression / np.pi:
+            # Every point spans at least one unit of the scale function, so
+            # none would be merged, e.g. an hour of one day's waits
+            self.means, self.weights = means, weights
+            return
+        before = np.cumsum(weights) - weights
+        # Points whose rank starts within the same unit of the scale function
+        # share a centroid, which keeps the centroids near the tails small
+        groups = np.floor(self._scale(before / total) - self._scale(0)).astype(int)
+        groups = np.unique(groups, return_inverse=True)[1]
+        self.weights = np.bincount(groups, weights=weights)
+        self.means = np.bincount(groups, weights=means * weights) / self.weights
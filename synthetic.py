@@ -0,0 +1,168 @@
+"""Synthetic parks.* data for benchmarks and query-plan checks.
+
+`reset_schema()` recreates the parks schema from attemp_1/db/initial_schema.sql
+plus migrations/, and `generate()` fills it with a configurable number of
+parks, attractions and days of wait samples. Both are destructive, so only
+point them at a scratch database. `add_arguments()` and `prepare()` give
+benchmark.py and explain_check.py the same options and setup.
+"""
+import glob
+import io
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import db
+import rollup
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(ROOT, 'attemp_1', 'db', 'initial_schema.sql')
+MIGRATIONS_DIR = os.path.join(ROOT, 'migrations')
+
+# The app filters rides with attraction_type_id = 2, so ids are fixed
+ATTRACTION_TYPES = [(1, 'SHOW', 'Show'), (2, 'ATTRACTION', 'Attraction'), (3, 'RESTAURANT', 'Restaurant')]
+STATUSES = [(1, 'OPERATING', 'Operating'), (2, 'DOWN', 'Down'), (3, 'CLOSED', 'Closed'), (4, 'REFURBISHMENT', 'Refurbishment')]
+SHOW_TYPE_ID, RIDE_TYPE_ID, RESTAURANT_TYPE_ID = 1, 2, 3
+OPERATING, DOWN, CLOSED, REFURBISHMENT = 1, 2, 3, 4
+
+
+def reset_schema(conn):
+    """Drop and recreate the parks schema, then apply every migration in order."""
+    with open(SCHEMA_FILE) as f:
+        # initial_schema.sql uses MySQL's ON UPDATE clause, which Postgres rejects
+        schema = re.sub(r'\s+ON UPDATE CURRENT_TIMESTAMP', '', f.read())
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS parks CASCADE")
+        cur.execute(schema)
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '*.sql'))):
+            with open(path) as f:
+                cur.execute(f.read())
+    conn.commit()
+
+
+def _copy(cur, table, columns, rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join('\\N' if v is None else str(v) for v in row))
+        buf.write('\n')
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+def generate(conn, parks=2, attractions=30, days=60, interval_minutes=15,
+             open_hour=8, close_hour=23, end=None, seed=0):
+    """Fill an empty parks schema with synthetic data. Returns the parks.wait row count.
+
+    Each park gets `attractions` attractions, about 80% of them rides. Every
+    attraction has a wait sample each `interval_minutes` between `open_hour`
+    and `close_hour` for the `days` days up to `end` (default now). Waits
+    follow a midday peak with noise and are rounded to 5 minutes, and rides
+    occasionally go down for a while, so runs of repeated rows look like what
+    the collector records.
+    """
+    rng = np.random.default_rng(seed)
+    end = (end or datetime.now()).replace(second=0, microsecond=0)
+    start = end - timedelta(days=days)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO parks.destination (oid, name, timezone, location)
+            VALUES ('synthetic', 'Synthetic Resort', 'America/Los_Angeles', 'Nowhere')
+            RETURNING id
+        """)
+        destination_id = cur.fetchone()[0]
+        _copy(cur, 'parks.attraction_type', ['id', 'key', 'type_name'], ATTRACTION_TYPES)
+        _copy(cur, 'parks.attraction_status', ['id', 'key', 'status'], STATUSES)
+        _copy(cur, 'parks.park', ['id', 'destination_id', 'oid', 'name', 'location'], [
+            (p, destination_id, f'park-{p}', f'Synthetic Park {p}', 'Nowhere')
+            for p in range(1, parks + 1)
+        ])
+
+        attraction_rows = []
+        for p in range(1, parks + 1):
+            for i in range(attractions):
+                attraction_id = (p - 1) * attractions + i + 1
+                if i % 5:
+                    type_id = RIDE_TYPE_ID
+                else:
+                    type_id = SHOW_TYPE_ID if i % 10 == 0 else RESTAURANT_TYPE_ID
+                attraction_rows.append((attraction_id, p, type_id, f'attraction-{attraction_id}',
+                                        f'Attraction {attraction_id:04d}', 0.0, 0.0))
+        _copy(cur, 'parks.attraction', ['id', 'park_id', 'attraction_type_id', 'oid', 'name', 'lat', 'long'],
+              attraction_rows)
+        for table in ('destination', 'park', 'attraction', 'attraction_type', 'attraction_status'):
+            cur.execute(f"SELECT setval('parks.{table}_id_seq', (SELECT MAX(id) FROM parks.{table}))")
+
+        # Sample times: every interval within opening hours on every day
+        day_starts = [start.date() + timedelta(days=d) for d in range(days + 1)]
+        slots_per_day = (close_hour - open_hour) * 60 // interval_minutes
+        times = [
+            datetime.combine(day, datetime.min.time()) + timedelta(hours=open_hour, minutes=s * interval_minutes)
+            for day in day_starts
+            for s in range(slots_per_day)
+        ]
+        times = [t for t in times if start <= t <= end]
+        hours = np.array([t.hour + t.minute / 60 for t in times])
+
+        total = 0
+        attraction_ids = np.array([row[0] for row in attraction_rows])
+        popularity = rng.uniform(5, 60, size=len(attraction_ids))
+        walk_on = rng.random(len(attraction_ids)) < 0.05
+        peak = np.exp(-((hours - 14.0) ** 2) / 18.0)
+        for a, attraction_id in enumerate(attraction_ids):
+            mean = popularity[a] * (0.4 + peak)
+            stand_by = np.maximum(0, np.round((mean + rng.normal(0, 6, len(times))) / 5) * 5).astype(int)
+            if walk_on[a]:
+                stand_by[:] = -1
+            status = np.full(len(times), OPERATING)
+            # Breakdowns: a few multi-sample Down runs per attraction
+            for s in rng.integers(0, len(times), size=max(1, days // 10)):
+                status[s:s + rng.integers(1, 8)] = DOWN
+            stand_by[status != OPERATING] = 0
+            _copy(cur, 'parks.wait', ['attraction_id', 'attraction_status_id', 'timestamp', 'last_updated',
+                                      'stand_by', 'created_on'], (
+                (attraction_id, status[s], t, t, stand_by[s], t)
+                for s, t in enumerate(times)
+            ))
+            total += len(times)
+    conn.commit()
+    return total
+
+
+def add_arguments(parser, days, interval):
+    """Add the scratch database and generate() options to an argparse parser."""
+    parser.add_argument('--db-url', required=True, help="scratch database; wiped unless --skip-generate")
+    parser.add_argument('--parks', type=int, default=2)
+    parser.add_argument('--attractions', type=int, default=40, help="attractions per park")
+    parser.add_argument('--days', type=int, default=days)
+    parser.add_argument('--interval', type=int, default=interval, help="minutes between wait samples")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-generate', action='store_true', help="reuse the data already loaded")
+
+
+def prepare(args):
+    """Point the pool at `args.db_url`, refill it unless --skip-generate, and roll it up.
+
+    Returns {'wait_rows', 'seconds'} of the generated data, or None when the
+    data already loaded was reused.
+    """
+    # The pool reads its settings on first use
+    os.environ['db_url'] = args.db_url
+
+    generated = None
+    with db.connection() as conn:
+        if not args.skip_generate:
+            reset_schema(conn)
+            started = time.perf_counter()
+            rows = generate(conn, parks=args.parks, attractions=args.attractions, days=args.days,
+                            interval_minutes=args.interval, seed=args.seed)
+            generated = {'wait_rows': rows, 'seconds': time.perf_counter() - started}
+        rollup.refresh(conn, settle=0)
+        if generated:
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE")
+            conn.commit()
+    return generated
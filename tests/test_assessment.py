@@ -0,0 +1,102 @@
+"""assessment.assess_waits labels and ordering, as the old per-row loop had them."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import assessment
+
+
+def current(rows):
+    return pd.DataFrame(rows, columns=['attraction_id', 'Attraction', 'Status', 'Wait Time (minutes)'])
+
+
+def baseline(attraction_id, avg_wait, wait, sample_count=10):
+    return {
+        'attraction_id': attraction_id,
+        'avg_wait': avg_wait,
+        'sample_count': sample_count,
+        'pct_of_avg': wait / avg_wait * 100 if avg_wait else None,
+    }
+
+
+@pytest.mark.parametrize('wait, label', [
+    (69, 'Very Good'),
+    (70, 'Very Good'),
+    (71, 'Good'),
+    (90, 'Good'),
+    (91, 'Average'),
+    (110, 'Average'),
+    (111, 'Busy'),
+    (130, 'Busy'),
+    (131, 'Very Busy'),
+])
+def test_threshold_edges_are_inclusive(wait, label):
+    df = assessment.assess_waits(current([(1, 'Ride', 'Operating', wait)]), [baseline(1, 100, wait)])
+    row = df.iloc[0]
+    assert row['Time-Based Assessment'] == label
+    assert row['Badge'] == label
+    assert row['Badge Color'] == assessment.ASSESSMENT_COLORS[label]
+    assert row['% of Average'] == round(wait, 1)
+    assert row['Avg Wait (Same Time)'] == 100
+
+
+def test_missing_baseline_is_not_assessed():
+    df = assessment.assess_waits(
+        current([(1, 'No history', 'Operating', 30), (2, 'No samples', 'Operating', 30)]),
+        [baseline(2, 0, 30, sample_count=0)],
+    )
+    assert list(df['Time-Based Assessment']) == [assessment.NOT_ASSESSED] * 2
+    assert list(df['% of Average']) == [assessment.NO_PERCENTAGE] * 2
+    assert df['Avg Wait (Same Time)'].isna().all()
+    assert list(df['Badge Color']) == [assessment.DEFAULT_COLOR] * 2
+
+
+def test_closed_and_nan_rows():
+    df = assessment.assess_waits(
+        current([
+            (1, 'Closed', 'Closed', np.nan),
+            (2, 'Down', 'Down', None),
+            (3, 'Refurb', 'Refurbishment', 40),
+            (4, 'Walk on', 'Operating', assessment.WALK_ON_WAIT),
+        ]),
+        [baseline(attraction_id, 20, 10) for attraction_id in (1, 2, 3, 4)],
+    ).set_index('attraction_id')
+    assert df.loc[1, 'Time-Based Assessment'] == assessment.NOT_ASSESSED
+    assert df.loc[1, '% of Average'] == assessment.NO_PERCENTAGE
+    for attraction_id, status in [(1, 'Closed'), (2, 'Down'), (3, 'Refurbishment')]:
+        assert df.loc[attraction_id, 'Non-Operating']
+        assert df.loc[attraction_id, 'Badge'] == status
+        assert df.loc[attraction_id, 'Badge Color'] == assessment.NON_OPERATING_COLOR
+    assert df.loc[4, 'Badge'] == assessment.WALK_ON_TEXT
+    assert df.loc[4, 'Badge Color'] == assessment.WALK_ON_COLOR
+    assert list(df.loc[[1, 2, 3, 4], 'Status_Order']) == [1, 2, 2, 1]
+
+
+def test_sort_order():
+    rows = [
+        (1, 'Down', 'Down', None),
+        (2, 'Busy', 'Operating', 60),
+        (3, 'No history', 'Operating', 10),
+        (4, 'Quiet', 'Operating', 10),
+        (5, 'Refurb', 'Refurbishment', None),
+        (6, 'Closed', 'Closed', None),
+        (7, 'Average', 'Operating', 30),
+    ]
+    baselines = [baseline(attraction_id, 30, wait or 0) for attraction_id, _, _, wait in rows if attraction_id != 3]
+    df = assessment.assess_waits(current(rows), baselines)
+    # Operating and closed rides first, by % of Average with the unassessed
+    # ones after them, then down and refurbishment
+    order = list(df['attraction_id'])
+    assert order[:3] == [4, 7, 2]
+    assert set(order[3:5]) == {3, 6}
+    assert set(order[5:]) == {1, 5}
+
+
+def test_empty_selection_and_duplicate_baselines():
+    df = assessment.assess_waits(current([]), [])
+    assert df.empty
+    df = assessment.assess_waits(
+        current([(1, 'Ride', 'Operating', 50)]),
+        [baseline(1, 100, 50), baseline(1, 10, 50)],
+    )
+    assert len(df) == 1 and df.iloc[0]['Time-Based Assessment'] == 'Very Good'
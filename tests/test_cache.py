@@ -0,0 +1,64 @@
+"""Expiry, eviction and single-flight loading in cache.TTLCache."""
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def test_maxsize_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, maxsize=3)
+    for key in range(3):
+        cache.get_or_load(key, lambda key=key: key)
+    cache.get_or_load(0, lambda: 'reloaded')
+    cache.get_or_load(3, lambda: 3)
+    assert list(cache._entries) == [2, 0, 3]
+    assert cache.get_or_load(0, lambda: 'reloaded') == 0
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'evictions': 1, 'size': 3}
+
+
+def test_expired_entries_dropped_on_store():
+    cache = TTLCache(ttl=0.01)
+    for key in range(10):
+        cache.get_or_load(key, lambda: key)
+    time.sleep(0.02)
+    cache.get_or_load('new', lambda: 1)
+    assert list(cache._entries) == ['new']
+
+
+def test_keep_stale_keeps_expired_entries_for_peek():
+    cache = TTLCache(ttl=0.01, keep_stale=True)
+    cache.get_or_load('old', lambda: 1)
+    time.sleep(0.02)
+    cache.get_or_load('new', lambda: 2)
+    assert cache.peek('old') == 1
+
+
+def test_concurrent_misses_load_once_and_release_key_locks():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('key', load)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [42] * 8
+    assert len(calls) == 1
+    assert cache._key_locks == {}
+
+
+def test_loader_error_caches_nothing():
+    cache = TTLCache(ttl=60)
+    with pytest.raises(ZeroDivisionError):
+        cache.get_or_load('key', lambda: 1 / 0)
+    assert cache.stats()['size'] == 0
+    assert cache._key_locks == {}
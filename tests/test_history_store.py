@@ -0,0 +1,111 @@
+"""history_store compaction and baselines on a synthetic store in tmp_path."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history_store
+
+OPERATING, DOWN = 1, 2
+STATUS_NAMES = {OPERATING: 'Operating', DOWN: 'Down'}
+START = datetime(2025, 3, 1, 8, 0)
+
+
+def synthetic_history(seed=0, attractions=4, days=21, interval_minutes=15):
+    """Rounded waits with repeats and Down runs, like what the collector records."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for attraction_id in range(1, attractions + 1):
+        for day in range(days):
+            for slot in range(14 * 60 // interval_minutes):
+                timestamp = START + timedelta(days=day, minutes=slot * interval_minutes)
+                status = DOWN if rng.random() < 0.05 else OPERATING
+                stand_by = 0 if status == DOWN else int(rng.choice([5, 10, 10, 15, 20, 30]))
+                rows.append((attraction_id, status, stand_by, timestamp))
+    history = pd.DataFrame(rows, columns=['attraction_id', 'attraction_status_id', 'stand_by', 'timestamp'])
+    history['id'] = np.arange(1, len(history) + 1)
+    history['status'] = history['attraction_status_id'].map(STATUS_NAMES)
+    history['created_on'] = history['timestamp']
+    history['park_id'] = 1
+    return history
+
+
+def compact_reference(history):
+    """The compactor lambda's rule, one row at a time."""
+    kept, previous = [], {}
+    for row in history.sort_values('timestamp', kind='stable').itertuples():
+        key = (row.attraction_id, row.created_on.date())
+        values = (row.attraction_status_id, row.stand_by)
+        if previous.get(key) != values:
+            kept.append(row.id)
+        previous[key] = values
+    return sorted(kept)
+
+
+def baseline_reference(history, attraction_id, day_of_week, hour, since, quantile=None):
+    """Same-time waits of one attraction, filtered and aggregated row by row."""
+    kept = set(compact_reference(history))
+    waits = [
+        row.stand_by for row in history.itertuples()
+        if row.id in kept and row.attraction_id == attraction_id and row.status == 'Operating' and
+        row.timestamp > since and (row.timestamp.weekday() + 1) % 7 == day_of_week and
+        abs(row.timestamp.hour - hour) <= 1
+    ]
+    return np.mean(waits) if quantile is None else np.quantile(waits, quantile), len(waits)
+
+
+@pytest.fixture
+def store(tmp_path):
+    history = synthetic_history()
+    # Written in several batches, the way export() appends them
+    for start in range(0, len(history), 2000):
+        history_store.append(str(tmp_path), history.iloc[start:start + 2000])
+    return str(tmp_path), history
+
+
+def test_round_trip_and_compaction_parity(store):
+    root, history = store
+    stored = history_store.read_history(root)
+    assert sorted(stored['id']) == list(history['id'])
+    compacted = history_store.compact(stored)
+    assert sorted(compacted['id']) == compact_reference(history)
+    assert len(compacted) < len(history)
+
+
+def test_read_history_filters(store):
+    root, history = store
+    since = START + timedelta(days=10, hours=3)
+    stored = history_store.read_history(root, attraction_ids=[2, 3], since=since)
+    expected = history[history['attraction_id'].isin([2, 3]) & (history['timestamp'] > since)]
+    assert sorted(stored['id']) == list(expected['id'])
+
+
+@pytest.mark.parametrize('quantile', [None, 0.5, 0.9])
+def test_fetch_baselines_matches_row_by_row(store, quantile):
+    root, history = store
+    since = START + timedelta(days=3)
+    current = [
+        {'attraction_id': 1, 'day_of_week': 2, 'hour_of_day': 12, 'Wait Time (minutes)': 20},
+        {'attraction_id': 3, 'day_of_week': 6, 'hour_of_day': 8, 'Wait Time (minutes)': 0},
+        {'attraction_id': 4, 'day_of_week': 0, 'hour_of_day': 21, 'Wait Time (minutes)': 15},
+    ]
+    baselines = {
+        row['attraction_id']: row
+        for row in history_store.fetch_baselines(root, current, since, quantile=quantile)
+    }
+    assert set(baselines) == {1, 3, 4}
+    for row in current:
+        expected_wait, expected_count = baseline_reference(
+            history, row['attraction_id'], row['day_of_week'], row['hour_of_day'], since, quantile)
+        baseline = baselines[row['attraction_id']]
+        assert baseline['sample_count'] == expected_count
+        assert baseline['avg_wait'] == pytest.approx(expected_wait)
+        assert baseline['pct_of_avg'] == pytest.approx(row['Wait Time (minutes)'] * 100 / expected_wait)
+
+
+def test_fetch_baselines_without_history(store):
+    root, _ = store
+    assert history_store.fetch_baselines(root, [], START) == []
+    current = [{'attraction_id': 99, 'day_of_week': 1, 'hour_of_day': 10, 'Wait Time (minutes)': 5}]
+    assert history_store.fetch_baselines(root, current, START) == []
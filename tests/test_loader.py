@@ -0,0 +1,139 @@
+"""loader.RunLengthFilter against the compactor lambda's run-length rule, without a database."""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from loader import RunLengthFilter
+
+OPERATING, DOWN = 1, 2
+START = datetime(2025, 3, 1, 8, 0)
+
+
+class FakeCursor:
+    """Answers RunLengthFilter's queries from (attraction_id, status_id, stand_by, timestamp, created_on) rows."""
+
+    def __init__(self, stored=()):
+        self.stored = list(stored)
+        self.result = []
+
+    def execute(self, sql, params):
+        if 'LIMIT 1' in sql:
+            # Latest stored row at or before each attraction's first timestamp
+            self.result = []
+            for attraction_id, first_timestamp in zip(*params):
+                earlier = [row for row in self.stored if row[0] == attraction_id and row[3] <= first_timestamp]
+                if earlier:
+                    _, status_id, stand_by, timestamp, created_on = max(earlier, key=lambda row: row[3])
+                    self.result.append((attraction_id, status_id, stand_by, timestamp, created_on.date()))
+        elif 'MIN(timestamp)' in sql:
+            self.result = []
+            for attraction_id in params[0]:
+                timestamps = [row[3] for row in self.stored if row[0] == attraction_id]
+                if timestamps:
+                    self.result.append((attraction_id, min(timestamps), max(timestamps)))
+        else:
+            wanted = set(zip(*params))
+            self.result = [(row[0], row[3], row[4].date()) for row in self.stored if (row[0], row[3]) in wanted]
+
+    def fetchall(self):
+        return self.result
+
+
+def wait_row(attraction_id, minutes, status_id=OPERATING, stand_by=10):
+    timestamp = START + timedelta(minutes=minutes)
+    return (attraction_id, status_id, timestamp, timestamp, stand_by, None, {}, timestamp)
+
+
+def kept_minutes(rows):
+    return [int((row[2] - START).total_seconds() // 60) for row in rows]
+
+
+def test_first_row_kept_and_repeats_dropped():
+    rows = [
+        wait_row(1, 0),
+        wait_row(1, 5),
+        wait_row(1, 10, stand_by=20),
+        wait_row(1, 15, stand_by=20),
+        wait_row(1, 20, status_id=DOWN, stand_by=20),
+        wait_row(1, 25, stand_by=20),
+        wait_row(2, 5),
+    ]
+    kept = RunLengthFilter().filter(FakeCursor(), rows)
+    assert [(row[0], minute) for row, minute in zip(kept, kept_minutes(kept))] == [
+        (1, 0), (2, 5), (1, 10), (1, 20), (1, 25),
+    ]
+
+
+def test_runs_restart_each_created_day():
+    rows = [wait_row(1, 0), wait_row(1, 60), wait_row(1, 24 * 60), wait_row(1, 24 * 60 + 5)]
+    assert kept_minutes(RunLengthFilter().filter(FakeCursor(), rows)) == [0, 24 * 60]
+
+
+def test_runs_continue_across_batches():
+    run_length = RunLengthFilter()
+    assert kept_minutes(run_length.filter(FakeCursor(), [wait_row(1, 0), wait_row(1, 5)])) == [0]
+    assert kept_minutes(run_length.filter(FakeCursor(), [wait_row(1, 10), wait_row(1, 15, stand_by=30)])) == [15]
+
+
+def test_out_of_order_rows_are_kept():
+    run_length = RunLengthFilter()
+    run_length.filter(FakeCursor(), [wait_row(1, 30)])
+    # Older than the last row seen: nothing to compare it with
+    assert kept_minutes(run_length.filter(FakeCursor(), [wait_row(1, 10), wait_row(1, 35)])) == [10]
+
+
+def test_first_row_compared_with_stored_row():
+    stored = [
+        (1, OPERATING, 10, START - timedelta(minutes=10), START - timedelta(minutes=10)),
+        (1, OPERATING, 40, START - timedelta(minutes=5), START - timedelta(minutes=5)),
+        (2, OPERATING, 10, START - timedelta(days=1), START - timedelta(days=1)),
+    ]
+    rows = [wait_row(1, 0, stand_by=40), wait_row(1, 5, stand_by=45), wait_row(2, 0)]
+    kept = RunLengthFilter().filter(FakeCursor(stored), rows)
+    # Attraction 1 continues its stored run; attraction 2's was another day
+    assert [(row[0], row[4]) for row in kept] == [(2, 10), (1, 45)]
+
+
+def test_stored_rows_skipped_and_count_as_previous():
+    # The database already has the rows the compactor kept of minutes 0-20
+    stored = [
+        (1, OPERATING, 10, START, START),
+        (1, DOWN, 0, START + timedelta(minutes=10), START + timedelta(minutes=10)),
+    ]
+    rows = [
+        wait_row(1, 0),
+        wait_row(1, 5),
+        wait_row(1, 10, status_id=DOWN, stand_by=0),
+        wait_row(1, 15, status_id=DOWN, stand_by=0),
+        wait_row(1, 20, status_id=DOWN, stand_by=0),
+        wait_row(1, 25),
+    ]
+    assert kept_minutes(RunLengthFilter().filter(FakeCursor(stored), rows)) == [25]
+
+
+def compact_reference(rows):
+    """The compactor lambda's rule over a whole day's rows, sorted by timestamp."""
+    kept, previous = [], {}
+    for row in sorted(rows, key=lambda row: row[2]):
+        key = (row[0], row[7].date())
+        if previous.get(key) != (row[1], row[4]):
+            kept.append(row)
+        previous[key] = (row[1], row[4])
+    return kept
+
+
+def test_batches_match_the_compactor():
+    rng = np.random.default_rng(5)
+    rows = [
+        wait_row(attraction_id, minutes,
+                 status_id=DOWN if rng.random() < 0.1 else OPERATING,
+                 stand_by=int(rng.choice([5, 10, 10, 15])))
+        for minutes in range(0, 3 * 24 * 60, 15)
+        for attraction_id in (1, 2, 3)
+    ]
+    run_length = RunLengthFilter()
+    kept = []
+    for start in range(0, len(rows), 100):
+        kept += run_length.filter(FakeCursor(), rows[start:start + 100])
+    assert sorted(kept, key=lambda row: (row[2], row[0])) == \
+        sorted(compact_reference(rows), key=lambda row: (row[2], row[0]))
@@ -0,0 +1,126 @@
+"""planner.py: park-local hourly profiles, the exact search and the beam search."""
+import itertools
+import math
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+import planner
+
+
+def test_profiles_are_bucketed_in_park_time():
+    # 2025-07-07 is a Monday; Los Angeles is UTC-7 in July
+    rows = [
+        (1, date(2025, 7, 7), 16, 60, 1),   # Monday 09:00 in the park
+        (1, date(2025, 7, 7), 9, 999, 1),   # Monday 02:00, not 09:00
+        (1, date(2025, 7, 8), 3, 30, 1),    # Monday 20:00, a Tuesday in UTC
+        (1, date(2025, 7, 7), 5, 999, 1),   # Sunday 22:00, a Monday in UTC
+    ]
+    monday = 1
+    hourly = planner.local_hourly_profiles(rows, (1,), monday, 'America/Los_Angeles')
+    assert hourly[0, 9] == 60
+    assert hourly[0, 20] == 30
+    assert hourly[0, 2] == 999
+    assert np.isnan(hourly[0, 16]) and np.isnan(hourly[0, 22])
+    # Without a time zone the same rows read as UTC hours
+    utc = planner.local_hourly_profiles(rows, (1,), monday, 'UTC')
+    assert utc[0, 16] == 60 and utc[0, 9] == 999
+
+
+def test_profiles_follow_daylight_saving():
+    # 17:00 UTC is 09:00 in Los Angeles in January (UTC-8), 10:00 in July
+    rows = [
+        (1, date(2025, 1, 6), 17, 20, 2),
+        (1, date(2025, 7, 7), 17, 50, 1),
+        (1, date(2025, 7, 7), 16, 80, 3),
+    ]
+    hourly = planner.local_hourly_profiles(rows, (1,), 1, 'America/Los_Angeles')
+    # Both 09:00 buckets are pooled by count
+    assert hourly[0, 9] == (20 + 80) / (2 + 3)
+    assert hourly[0, 10] == 50
+
+
+def test_plan_in_park_time_reads_the_park_hours():
+    # Each bucket's wait is its park-time hour: 08:00 to 21:00 in Los Angeles
+    # are 15:00 UTC on 2025-07-07 to 04:00 UTC the next day
+    rows = [(1, date(2025, 7, 7), hour, hour - 7, 1) for hour in range(15, 24)]
+    rows += [(1, date(2025, 7, 8), hour, hour + 17, 1) for hour in range(0, 5)]
+    hourly = planner.local_hourly_profiles(rows, (1,), 1, 'America/Los_Angeles')
+    assert list(hourly[0, 8:22]) == list(range(8, 22))
+
+    start, close = datetime(2025, 7, 7, 9, 0), datetime(2025, 7, 7, 22, 0)
+    result = planner.plan((1,), hourly, start, close)
+    stop, = result['stops']
+    assert stop['arrive'] == start
+    # Halfway between the 08:00 and 09:00 averages, held at their middles
+    assert stop['expected_wait'] == 8.5
+
+
+def random_profiles(seed, rides):
+    rng = np.random.default_rng(seed)
+    hourly = rng.uniform(0, 60, size=(rides, 24)).round()
+    hourly[rng.random(hourly.shape) < 0.1] = np.nan
+    return hourly
+
+
+def brute_force_score(waits, ride_minutes):
+    """Best (-rides done, total wait) over every visiting order."""
+    timetable = planner._Timetable(waits, planner.SLOT_MINUTES, ride_minutes)
+    return min(
+        planner._score(timetable.run(order)[0])
+        for order in itertools.permutations(range(len(waits)))
+    )
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_exact_plan_matches_brute_force(seed):
+    rides = 5
+    attraction_ids = tuple(range(1, rides + 1))
+    hourly = random_profiles(seed, rides)
+    start = datetime(2025, 7, 7, 9, 0)
+    # Short days leave rides out, long ones fit them all
+    close = start + timedelta(hours=[1, 2, 4, 12][seed % 4])
+    result = planner.plan(attraction_ids, hourly, start, close, ride_minutes=10)
+    assert result['method'] == 'exact'
+
+    slots = math.ceil((close - start).total_seconds() / 60 / planner.SLOT_MINUTES)
+    waits = planner.slot_waits(hourly, start, slots)
+    expected_count, expected_wait = brute_force_score(waits, 10)
+    assert len(result['stops']) == -expected_count
+    assert result['total_wait'] == pytest.approx(expected_wait)
+    assert len(result['stops']) + len(result['unplanned']) == rides
+
+
+def test_beam_search_is_exact_when_wide_enough():
+    rides = 7
+    waits = planner.slot_waits(random_profiles(11, rides), datetime(2025, 7, 7, 9, 0), 16)
+    timetable = planner._Timetable(waits, planner.SLOT_MINUTES, 10)
+    exact = planner._score(timetable.run(planner._exact_order(timetable, rides))[0])
+    beam = planner._score(timetable.run(planner._beam_order(timetable, rides, width=1 << rides))[0])
+    assert beam == pytest.approx(exact)
+
+
+def test_large_selection_uses_beam_search():
+    rides = planner.DP_MAX_RIDES + 4
+    attraction_ids = tuple(range(100, 100 + rides))
+    hourly = random_profiles(3, rides)
+    start, close = datetime(2025, 7, 7, 9, 0), datetime(2025, 7, 7, 17, 0)
+    result = planner.plan(attraction_ids, hourly, start, close, skip={101}, ride_minutes=10)
+    assert result['method'] == 'heuristic'
+
+    planned = [stop['attraction_id'] for stop in result['stops']]
+    assert sorted(planned + result['unplanned']) == list(attraction_ids)
+    assert 101 in result['unplanned'] and 101 not in planned
+    # Each queue is joined after the previous ride, and before close
+    ready = start
+    for stop in result['stops']:
+        assert ready <= stop['arrive'] < close
+        ready = stop['arrive'] + timedelta(minutes=stop['expected_wait'] + 10)
+
+    # At least as good as visiting the rides in the order given
+    rows = [i for i, attraction_id in enumerate(attraction_ids) if attraction_id != 101]
+    slots = math.ceil((close - start).total_seconds() / 60 / planner.SLOT_MINUTES)
+    timetable = planner._Timetable(planner.slot_waits(hourly[rows], start, slots), planner.SLOT_MINUTES, 10)
+    in_order = planner._score(timetable.run(range(len(rows)))[0])
+    assert (-len(result['stops']), result['total_wait']) <= in_order
@@ -0,0 +1,90 @@
+"""Accuracy of sketch.TDigest against exact quantiles from NumPy."""
+import numpy as np
+import pytest
+
+from sketch import TDigest
+
+QUANTILES = [0.5, 0.75, 0.9]
+
+# An estimate for quantile q must lie between the exact quantiles at
+# q - RANK_ERROR and q + RANK_ERROR, i.e. be off by at most one percentile
+RANK_ERROR = 0.01
+
+# Minutes an estimate of rounded waits may fall outside that range. Ties make
+# the exact quantiles jump 5 minutes at a time while the digest interpolates
+# between its centroids; across 200 seeds it stayed within 0.84 minutes.
+ROUNDED_TOLERANCE = 1.0
+
+
+def continuous_waits(rng, size):
+    return 30 * rng.lognormal(0, 0.6, size)
+
+
+def rounded_waits(rng, size):
+    # What the parks report: whole minutes in steps of 5, many ties
+    return np.round(continuous_waits(rng, size) / 5) * 5
+
+
+@pytest.fixture(params=[(continuous_waits, 0.0), (rounded_waits, ROUNDED_TOLERANCE)],
+                ids=['continuous', 'rounded'])
+def waits(request):
+    """20,000 waits and the tolerance their estimates are checked with."""
+    generate, tolerance = request.param
+    return generate(np.random.default_rng(7), 20000), tolerance
+
+
+def assert_close(digest, waits):
+    values, tolerance = waits
+    for q in QUANTILES:
+        low, high = np.quantile(values, [q - RANK_ERROR, q + RANK_ERROR])
+        estimate = digest.quantile(q)
+        assert low - tolerance <= estimate <= high + tolerance, (q, estimate, low, high)
+
+
+def test_streaming_add(waits):
+    values, _ = waits
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    assert digest.count == len(values)
+    assert_close(digest, waits)
+
+
+def test_merged_small_digests(waits):
+    # Roughly one digest per hour of a day's waits, as in parks.wait_sketch
+    values, _ = waits
+    digests = [TDigest().add(chunk) for chunk in np.array_split(values, 1000)]
+    merged = TDigest.merged(digests)
+    assert merged.count == len(values)
+    assert_close(merged, waits)
+
+
+def test_merge_one_at_a_time(waits):
+    values, _ = waits
+    digest = TDigest()
+    for chunk in np.array_split(values, 500):
+        digest.merge(TDigest().add(chunk))
+    assert digest.count == len(values)
+    assert_close(digest, waits)
+
+
+def test_bytes_round_trip(waits):
+    digest = TDigest().add(waits[0])
+    restored = TDigest.from_bytes(digest.to_bytes())
+    assert restored.count == digest.count
+    assert (restored.min, restored.max) == (digest.min, digest.max)
+    np.testing.assert_array_equal(restored.quantile(QUANTILES), digest.quantile(QUANTILES))
+    assert_close(restored, waits)
+
+
+def test_merged_round_tripped_digests(waits):
+    stored = [TDigest().add(chunk).to_bytes() for chunk in np.array_split(waits[0], 1000)]
+    merged = TDigest.merged(TDigest.from_bytes(data) for data in stored)
+    assert_close(merged, waits)
+
+
+def test_empty():
+    assert np.isnan(TDigest().quantile(0.5))
+    assert TDigest.merged([]).count == 0
+    with pytest.raises(ValueError):
+        TDigest.from_bytes(b'XXXX' + bytes(28))
@@ -0,0 +1,258 @@
+import os
+import time
+
+from psycopg2.extras import RealDictCursor
+
+import db
+import reference
+from cache import TTLCache
+
+# How often the collector lambda writes new waits, and how many seconds past
+# each interval boundary its rows land. Snapshots expire at the next landing.
+COLLECTOR_INTERVAL = float(os.getenv('collector_interval', '300'))
+COLLECTOR_OFFSET = float(os.getenv('collector_offset', '0'))
+
+# Expired snapshots are kept so a refresh only fetches the rows added since
+snapshot_cache = TTLCache(ttl=COLLECTOR_INTERVAL, keep_stale=True)
+
+
+def seconds_until_next_collection(now=None):
+    if now is None:
+        now = time.time()
+    return COLLECTOR_INTERVAL - (now - COLLECTOR_OFFSET) % COLLECTOR_INTERVAL
+
+
+_WAIT_COLUMNS = """
+    a.id as attraction_id,
+    a.name as "Attraction",
+    w.stand_by as "Wait Time (minutes)",
+    w.timestamp as "Last Updated",
+    s.status as "Status",
+    EXTRACT(DOW FROM w.timestamp) as day_of_week,
+    EXTRACT(HOUR FROM w.timestamp) as hour_of_day
+"""
+
+
+# The newest row per attraction is looked up one attraction at a time, which
+# the (attraction_id, timestamp DESC) index from migrations/002 answers with a
+# single index probe each, whatever the size of the history.
+LATEST_WAITS_SQL = """
+    SELECT """ + _WAIT_COLUMNS + """
+    FROM parks.attraction a
+    CROSS JOIN LATERAL (
+        SELECT *
+        FROM parks.wait lw
+        WHERE lw.attraction_id = a.id
+        ORDER BY lw.timestamp DESC
+        LIMIT 1
+    ) w
+    JOIN parks.attraction_status s ON w.attraction_status_id = s.id
+    WHERE a.park_id = %s
+    ORDER BY w.stand_by ASC NULLS LAST
+"""
+
+WAITS_SINCE_SQL = """
+    SELECT """ + _WAIT_COLUMNS + """
+    FROM parks.attraction a
+    CROSS JOIN LATERAL (
+        SELECT *
+        FROM parks.wait lw
+        WHERE lw.attraction_id = a.id AND lw.timestamp > %s
+        ORDER BY lw.timestamp DESC
+        LIMIT 1
+    ) w
+    JOIN parks.attraction_status s ON w.attraction_status_id = s.id
+    WHERE a.park_id = %s
+"""
+
+
+def _fetch_park_snapshot(conn, park_id):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(LATEST_WAITS_SQL, (park_id,))
+        return cur.fetchall()
+
+
+def fetch_waits_since(conn, park_id, since):
+    """Newest wait row of each attraction in a park recorded after `since`.
+
+    Attractions with nothing newer are left out, so between collector runs
+    this returns no rows at all.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(WAITS_SINCE_SQL, (since, park_id))
+        return cur.fetchall()
+
+
+def _refresh_park_snapshot(park_id, previous):
+    with db.connection() as conn:
+        if not previous:
+            return _fetch_park_snapshot(conn, park_id)
+        # Only pull the rows the collector added since the previous snapshot
+        since = max(row['Last Updated'] for row in previous)
+        newer = fetch_waits_since(conn, park_id, since)
+    if not newer:
+        return previous
+    rows = {row['attraction_id']: row for row in previous}
+    rows.update((row['attraction_id'], row) for row in newer)
+    return sorted(rows.values(), key=lambda row: row['Wait Time (minutes)'])
+
+
+def get_park_snapshot(park_id):
+    """Latest status and wait of every attraction in a park.
+
+    One snapshot per park is shared by every session in the process and
+    refreshed at most once per collector interval; concurrent misses run a
+    single query. After the first load a refresh only fetches the rows added
+    since the previous snapshot. Rows are ordered by wait, shortest first,
+    and must not be modified.
+    """
+    key = ('park_snapshot', park_id)
+    return snapshot_cache.get_or_load(
+        key,
+        lambda: _refresh_park_snapshot(park_id, snapshot_cache.peek(key)),
+        ttl=seconds_until_next_collection(),
+    )
+
+
+def get_latest_waits(attraction_ids):
+    """Latest wait rows for the given attractions, filtered from the park snapshots."""
+    attraction_park_ids = reference.get_attraction_park_ids()
+    wanted = set(attraction_ids)
+    park_ids = sorted({attraction_park_ids[aid] for aid in wanted if aid in attraction_park_ids})
+    rows = [
+        row
+        for park_id in park_ids
+        for row in get_park_snapshot(park_id)
+        if row['attraction_id'] in wanted
+    ]
+    if len(park_ids) > 1:
+        rows.sort(key=lambda row: row['Wait Time (minutes)'])
+    return rows
+
+
+def get_destination_waits(destination_id):
+    """Latest wait rows for every ride in a destination, each with a "Park" name.
+
+    Built from the same shared park snapshots as get_latest_waits, so ranking
+    a whole destination costs at most one query per park. Rows are ordered
+    by wait, shortest first.
+    """
+    rides = reference.get_destination_rides(destination_id)
+    park_names = {ride['id']: ride['park_name'] for ride in rides}
+    park_ids = sorted({ride['park_id'] for ride in rides})
+    rows = [
+        dict(row, Park=park_names[row['attraction_id']])
+        for park_id in park_ids
+        for row in get_park_snapshot(park_id)
+        if row['attraction_id'] in park_names
+    ]
+    rows.sort(key=lambda row: row['Wait Time (minutes)'])
+    return rows
+
+
+BASELINES_SQL = """
+    WITH targets AS (
+        SELECT DISTINCT ON (attraction_id) *
+        FROM unnest(%s::bigint[], %s::int[], %s::int[], %s::bigint[])
+            AS t(attraction_id, day_of_week, hour_of_day, current_wait)
+    ),
+    totals AS (
+        SELECT
+            t.attraction_id,
+            t.current_wait,
+            SUM(b.stand_by_sum) / NULLIF(SUM(b.stand_by_count), 0) as avg_wait,
+            SUM(b.stand_by_count) as sample_count
+        FROM targets t
+        JOIN parks.wait_baseline b ON
+            b.attraction_id = t.attraction_id AND
+            b.day_of_week = t.day_of_week AND
+            b.hour_of_day BETWEEN GREATEST(0, t.hour_of_day - 1) AND LEAST(23, t.hour_of_day + 1)
+        WHERE b.day + make_interval(hours => b.hour_of_day) >= date_trunc('hour', %s::timestamp)
+        GROUP BY t.attraction_id, t.current_wait
+    )
+    SELECT
+        attraction_id,
+        avg_wait::float8 as avg_wait,
+        sample_count,
+        (current_wait * 100.0 / NULLIF(avg_wait, 0))::float8 as pct_of_avg
+    FROM totals
+"""
+
+
+def fetch_baselines(conn, current_wait_times, since):
+    """Historical baselines for every attraction in one round trip.
+
+    For each row of `current_wait_times` (attraction_id, day_of_week,
+    hour_of_day and "Wait Time (minutes)", as returned by the latest wait
+    query) this averages the Operating `stand_by` values recorded since
+    `since` on the same day of week within ±1 hour, read from the
+    parks.wait_baseline rollup. Only the aggregates come back: one row per
+    attraction with attraction_id, `avg_wait`, `sample_count` and
+    `pct_of_avg` (the current wait as a percentage of the average, or None).
+    """
+    if not current_wait_times:
+        return []
+
+    attraction_ids = [int(row['attraction_id']) for row in current_wait_times]
+    days_of_week = [int(row['day_of_week']) for row in current_wait_times]
+    hours_of_day = [int(row['hour_of_day']) for row in current_wait_times]
+    current_waits = [row['Wait Time (minutes)'] for row in current_wait_times]
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(BASELINES_SQL, (attraction_ids, days_of_week, hours_of_day, current_waits, since))
+        return cur.fetchall()
+
+
+SKETCHES_SQL = """
+    WITH targets AS (
+        SELECT DISTINCT ON (attraction_id) *
+        FROM unnest(%s::bigint[], %s::int[], %s::int[]) AS t(attraction_id, day_of_week, hour_of_day)
+    )
+    SELECT t.attraction_id, array_agg(s.digest) as digests
+    FROM targets t
+    JOIN parks.wait_sketch s ON
+        s.attraction_id = t.attraction_id AND
+        s.day_of_week = t.day_of_week AND
+        s.hour_of_day BETWEEN GREATEST(0, t.hour_of_day - 1) AND LEAST(23, t.hour_of_day + 1)
+    WHERE s.day + make_interval(hours => s.hour_of_day) >= date_trunc('hour', %s::timestamp)
+    GROUP BY t.attraction_id
+"""
+
+
+def fetch_quantile_baselines(conn, current_wait_times, since, quantile):
+    """Like fetch_baselines, with a quantile of the same waits in place of the mean.
+
+    The parks.wait_sketch digests of each attraction's window are merged and
+    `quantile` (e.g. 0.5 for the median) is read from the result, so the
+    cost depends on the length of the window, not on how many waits it
+    holds. Rows have the same keys as fetch_baselines' rows, with `avg_wait`
+    holding the quantile and `pct_of_avg` the current wait as a percentage
+    of it.
+    """
+    if not current_wait_times:
+        return []
+    # NumPy-backed, so only loaded once a percentile baseline is asked for
+    from sketch import TDigest
+
+    current_waits = {int(row['attraction_id']): row['Wait Time (minutes)'] for row in current_wait_times}
+    with conn.cursor() as cur:
+        cur.execute(SKETCHES_SQL, (
+            [int(row['attraction_id']) for row in current_wait_times],
+            [int(row['day_of_week']) for row in current_wait_times],
+            [int(row['hour_of_day']) for row in current_wait_times],
+            since,
+        ))
+        rows = cur.fetchall()
+
+    baselines = []
+    for attraction_id, digests in rows:
+        digest = TDigest.merged(TDigest.from_bytes(bytes(data)) for data in digests)
+        value = float(digest.quantile(quantile))
+        current_wait = current_waits[attraction_id]
+        baselines.append({
+            'attraction_id': attraction_id,
+            'avg_wait': value,
+            'sample_count': int(digest.count),
+            'pct_of_avg': None if current_wait is None or value == 0 else current_wait * 100.0 / value,
+        })
+    return baselines